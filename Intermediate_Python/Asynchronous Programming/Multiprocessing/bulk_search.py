@@ -0,0 +1,216 @@
+import concurrent.futures
+import glob
+import os
+import re
+import time
+from collections import namedtuple
+
+"""
+Search many files with the same set of regex patterns, in parallel.
+
+Regex matching is CPU-bound, so threads do not help (the GIL lets only one of
+them run Python code at a time). BulkSearch shards the files across a
+ProcessPoolExecutor instead: each task is a small batch of files, so tiny log
+files do not pay the inter-process overhead one by one, and only a bounded
+number of batches is in flight, so a directory with tens of thousands of
+files does not create tens of thousands of futures up front.
+
+Results are yielded per file as soon as their batch finishes (completion
+order, not file order), each with the time the worker spent on it, and the
+search keeps running totals for bytes, files, matches and MB/s.
+"""
+
+# Search result for a single file
+# matches: dictionary pattern name -> list of (offset, matched text)
+# counts: dictionary pattern name -> number of matches (not capped by max_matches)
+FileResult = namedtuple("FileResult", ["path", "size", "seconds", "matches", "counts", "error"])
+
+
+def iter_files(target, recursive=True):
+    """
+    Yield the files to search.
+
+    Args:
+        target: A directory, a glob pattern such as "logs/**/*.log", or a file
+        recursive: Walk sub-directories when target is a directory
+    """
+    if os.path.isdir(target):
+        for root, dirs, files in os.walk(target):
+            for name in sorted(files):
+                yield os.path.join(root, name)
+            if not recursive:
+                break
+    elif os.path.isfile(target):
+        yield target
+    else:
+        # A pattern such as "logs/*" also matches sub-directories
+        yield from (path for path in glob.iglob(target, recursive=True) if os.path.isfile(path))
+
+
+def search_file(path, patterns, max_matches=1000, encoding="utf-8"):
+    """
+    Run every pattern over one file. Runs inside a worker process.
+
+    Args:
+        path: File to search
+        patterns: Dictionary name -> compiled pattern (str or bytes patterns)
+        max_matches: Matches kept per pattern, the counts include all of them
+        encoding: Used to decode the file for str patterns
+    """
+    start = time.perf_counter()
+    try:
+        with open(path, "rb") as file:
+            data = file.read()
+    except OSError as error:
+        return FileResult(path, 0, time.perf_counter() - start, {}, {}, str(error))
+
+    text = None
+    matches = {}
+    counts = {}
+    for name, pattern in patterns.items():
+        if isinstance(pattern.pattern, str):
+            if text is None:
+                text = data.decode(encoding, errors="replace")
+            haystack = text
+        else:
+            haystack = data
+        found = []
+        count = 0
+        for m in pattern.finditer(haystack):
+            count += 1
+            if count <= max_matches:
+                found.append((m.start(), m.group()))
+        matches[name] = found
+        counts[name] = count
+    return FileResult(path, len(data), time.perf_counter() - start, matches, counts, None)
+
+
+def _search_batch(paths, patterns, max_matches, encoding):
+    return [search_file(path, patterns, max_matches, encoding) for path in paths]
+
+
+class BulkSearch:
+    """Search a directory or glob of files with a process pool."""
+
+    def __init__(self, target, patterns, flags=0, max_workers=None, files_per_task=16,
+                 max_matches=1000, encoding="utf-8", recursive=True):
+        """
+        Prepare the search; it starts when the object is iterated.
+
+        Args:
+            target: A directory, a glob pattern or a single file
+            patterns: Dictionary name -> pattern, or a list of patterns (named
+                by their source); sources are compiled with flags
+            flags: re flags for patterns that are not compiled yet
+            max_workers: Number of worker processes, os.cpu_count() by default
+            files_per_task: Files searched by one task
+            max_matches: Matches kept per pattern and file
+            encoding: Used to decode files for str patterns
+            recursive: Walk sub-directories of a directory target
+        """
+        if not isinstance(patterns, dict):
+            patterns = {getattr(p, "pattern", p): p for p in patterns}
+        self.patterns = {name: p if isinstance(p, re.Pattern) else re.compile(p, flags)
+                         for name, p in patterns.items()}
+        self.target = target
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.files_per_task = files_per_task
+        self.max_matches = max_matches
+        self.encoding = encoding
+        self.recursive = recursive
+
+        self.files = 0
+        self.total_bytes = 0
+        self.total_matches = 0
+        self.errors = 0
+        self.elapsed = 0.0
+
+    def _batches(self):
+        batch = []
+        for path in iter_files(self.target, self.recursive):
+            batch.append(path)
+            if len(batch) == self.files_per_task:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def __iter__(self):
+        """Yield a FileResult for every file, in completion order."""
+        start = time.perf_counter()
+        batches = self._batches()
+        max_in_flight = self.max_workers * 4  # keeps every worker busy without queueing everything
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            in_flight = set()
+            try:
+                while True:
+                    for batch in batches:
+                        in_flight.add(executor.submit(_search_batch, batch, self.patterns,
+                                                      self.max_matches, self.encoding))
+                        if len(in_flight) >= max_in_flight:
+                            break
+                    if not in_flight:
+                        break
+                    done, in_flight = concurrent.futures.wait(
+                        in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        for result in future.result():
+                            self.files += 1
+                            self.total_bytes += result.size
+                            self.total_matches += sum(result.counts.values())
+                            self.errors += result.error is not None
+                            self.elapsed = time.perf_counter() - start
+                            yield result
+            finally:
+                for future in in_flight:
+                    future.cancel()  # the caller stopped early
+        self.elapsed = time.perf_counter() - start
+
+    @property
+    def throughput(self):
+        """MB searched per second of wall time so far."""
+        return self.total_bytes / 1_000_000 / self.elapsed if self.elapsed else 0.0
+
+    def report(self):
+        return (f"{self.files} files, {self.total_bytes / 1_000_000:.1f} MB, "
+                f"{self.total_matches} matches, {self.errors} errors in {self.elapsed:.2f}s "
+                f"({self.throughput:.1f} MB/s, {self.max_workers} workers)")
+
+
+def bulk_search(target, patterns, **options):
+    """Shortcut: iterate BulkSearch(target, patterns, **options)."""
+    return iter(BulkSearch(target, patterns, **options))
+
+
+if __name__ == "__main__":
+    import shutil
+    import tempfile
+
+    # Some generated log files to search
+    directory = tempfile.mkdtemp()
+    line = "2024-01-01 INFO user=Chandra Prakash Tekwani paid $10\n"
+    for i in range(200):
+        with open(os.path.join(directory, f"app{i}.log"), "w") as file:
+            file.write(line * 5000)
+            if i % 50 == 0:
+                file.write("2024-01-01 ERROR payment failed\n")
+
+    patterns = {
+        "ch_or_ph": re.compile("[CP]h"),
+        "word": re.compile(r"\bChandra\b"),
+        "ignorecase": re.compile("tekwani", re.IGNORECASE),
+        "errors": re.compile(rb"^.*ERROR.*$", re.MULTILINE),
+    }
+    try:
+        for workers in sorted({1, os.cpu_count() or 1}):
+            search = BulkSearch(os.path.join(directory, "*.log"), patterns, max_workers=workers)
+            slowest = None
+            for result in search:
+                if result.counts["errors"]:
+                    print(f"{os.path.basename(result.path)}: {result.matches['errors']}")
+                if slowest is None or result.seconds > slowest.seconds:
+                    slowest = result
+            print(search.report())
+            print(f"slowest file: {os.path.basename(slowest.path)} {slowest.seconds * 1000:.1f} ms")
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,175 @@
+import collections
+import concurrent.futures
+import itertools
+import os
+import time
+
+"""
+A process-pool map that picks its own chunk size and streams the results.
+
+Sending one item per task to a process pool, as executor.map(func, items)
+does by default, pickles and pipes every item and every result on its own.
+For a function like square() from Functional_Programming/code.py that
+overhead is a hundred times the work. Sending items in chunks fixes that, but
+the right chunk size depends on how long func takes per item, which the
+caller usually does not know.
+
+AdaptiveMap measures it. Each chunk reports how long the worker spent on it;
+the average cost per item gives the chunk size that keeps a worker busy for
+about target_seconds per task: long enough to make the overhead small, short
+enough to spread the work evenly and return results steadily. It starts with
+tiny chunks and grows them as the measurements come in.
+
+Only max_in_flight chunks are submitted at a time and items are taken from
+the iterable as needed, so a huge (or endless) generator is never turned into
+a list. Results are yielded as they arrive, in input order (ordered=True) or
+in completion order, which does not wait for a slow chunk.
+"""
+
+
+def _run_chunk(func, items):
+    """Runs in a worker: apply func to every item, timing the work."""
+    start = time.perf_counter()
+    results = [func(item) for item in items]
+    return results, time.perf_counter() - start
+
+
+class AdaptiveMap:
+    """Parallel map over a process pool with a self-tuning chunk size."""
+
+    def __init__(self, workers=None, target_seconds=0.05, max_in_flight=None, min_chunk=1,
+                 max_chunk=100_000, executor=None):
+        """
+        Args:
+            workers: Worker processes, os.cpu_count() by default
+            target_seconds: Time one chunk should take in a worker
+            max_in_flight: Chunks submitted but not yet consumed, 2 per worker by default
+            min_chunk: Smallest chunk size
+            max_chunk: Largest chunk size
+            executor: An existing ProcessPoolExecutor to use instead of a new one
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.target_seconds = target_seconds
+        self.max_in_flight = max_in_flight or self.workers * 2
+        self.min_chunk = min_chunk
+        self.max_chunk = max_chunk
+        self.executor = executor
+        self.item_cost = None  # measured seconds per item, a moving average
+        self.chunk_size = min_chunk
+        self.chunks = 0
+        self.items = 0
+
+    def _record(self, count, seconds):
+        """Fold a finished chunk into the cost estimate and pick the next chunk size."""
+        self.chunks += 1
+        self.items += count
+        cost = seconds / count
+        # Weight by the chunk's size: one tiny early chunk must not dominate the estimate
+        weight = min(count / (count + max(self.chunk_size, 1)), 0.5)
+        self.item_cost = cost if self.item_cost is None else (
+            self.item_cost * (1 - weight) + cost * weight)
+        wanted = int(self.target_seconds / self.item_cost) if self.item_cost else self.max_chunk
+        # Grow at most 4x at a time, shrink straight away
+        wanted = min(wanted, self.chunk_size * 4)
+        self.chunk_size = max(self.min_chunk, min(wanted, self.max_chunk))
+
+    def map(self, func, iterable, ordered=True):
+        """
+        Yield func(item) for every item.
+
+        Args:
+            func: Module level function (it is pickled by name)
+            iterable: Items, consumed lazily
+            ordered: Yield results in input order; False yields each chunk's
+                results as soon as it is done
+        """
+        executor = self.executor or concurrent.futures.ProcessPoolExecutor(self.workers)
+        items = iter(iterable)
+        pending = collections.deque()  # futures in submission order
+        try:
+            exhausted = False
+            while True:
+                while not exhausted and len(pending) < self.max_in_flight:
+                    chunk = list(itertools.islice(items, self.chunk_size))
+                    if not chunk:
+                        exhausted = True
+                        break
+                    pending.append(executor.submit(_run_chunk, func, chunk))
+                if not pending:
+                    return
+                if ordered:
+                    future = pending.popleft()
+                else:
+                    done, _ = concurrent.futures.wait(
+                        pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                    future = done.pop()
+                    pending.remove(future)
+                results, seconds = future.result()
+                self._record(len(results), seconds)
+                yield from results
+        finally:
+            for future in pending:
+                future.cancel()  # the caller stopped early, or something failed
+            if self.executor is None:
+                executor.shutdown(cancel_futures=True)
+
+
+def parallel_map(func, iterable, workers=None, ordered=True, **options):
+    """Shortcut for AdaptiveMap(workers, **options).map(func, iterable, ordered)."""
+    return AdaptiveMap(workers, **options).map(func, iterable, ordered)
+
+
+def square(x):
+    return x * x
+
+
+def is_even(x):
+    return x % 2 == 0
+
+
+def digit_sum_of_power(x):
+    """A heavier function: a few hundred microseconds per item."""
+    return sum(int(digit) for digit in str(x ** 400))
+
+
+if __name__ == "__main__":
+    # square() and filtering() from Functional_Programming/code.py on a process pool
+    squared_numbers = list(parallel_map(square, range(1, 11)))
+    print([x for x, even in zip(squared_numbers, parallel_map(is_even, squared_numbers)) if even])
+
+    count = 200_000
+    workers = os.cpu_count() or 1
+    for func, label, items in [(square, "square (tiny work)", range(count)),
+                               (digit_sum_of_power, "digit_sum_of_power (heavier work)", range(2000))]:
+        print(label)
+        expected = list(map(func, items))
+
+        start = time.perf_counter()
+        list(map(func, items))
+        print(f"  {'built-in map, 1 process':<34} {time.perf_counter() - start:>7.2f}s")
+
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            small = items if len(items) <= 2000 else items[:20_000]  # chunksize=1 is very slow
+            start = time.perf_counter()
+            assert list(executor.map(func, small)) == expected[:len(small)]
+            elapsed = (time.perf_counter() - start) * len(items) / len(small)
+            print(f"  {'executor.map, chunksize=1':<34} {elapsed:>7.2f}s"
+                  + ("  (extrapolated)" if small is not items else ""))
+
+        for ordered in (True, False):
+            mapper = AdaptiveMap(workers)
+            start = time.perf_counter()
+            results = list(mapper.map(func, items, ordered=ordered))
+            elapsed = time.perf_counter() - start
+            assert (results if ordered else sorted(results)) == (
+                expected if ordered else sorted(expected))
+            label = f"AdaptiveMap, {'ordered' if ordered else 'unordered'}"
+            print(f"  {label:<34} {elapsed:>7.2f}s  chunk size {mapper.chunk_size}, "
+                  f"{mapper.item_cost * 1e6:.1f} us per item, {mapper.chunks} chunks")
+
+    # An endless generator works too: only max_in_flight chunks exist at any time
+    naturals = itertools.count()
+    for value in parallel_map(square, naturals):
+        if value > 1_000_000:
+            print("first square over a million:", value)
+            break
@@ -0,0 +1,410 @@
+import collections
+import concurrent.futures
+import concurrent.futures.process
+import importlib
+import itertools
+import multiprocessing
+import os
+import pickle
+import threading
+import time
+
+"""
+A long-lived process pool whose workers are ready before the work arrives.
+
+Creating a ProcessPoolExecutor for each job means starting fresh worker
+processes each time. With the "spawn" start method (the default on Windows
+and macOS) every one of them starts a new interpreter and imports every
+module the task needs again, which easily takes hundreds of milliseconds.
+
+WarmPool starts its workers once and keeps them:
+
+1. Each worker imports the preload modules (and runs an optional initializer)
+   as soon as it starts, before the first task, so no task pays for imports.
+2. Workers are reused across jobs; submit() only sends the task.
+3. A worker that ran max_tasks tasks, or whose memory grew past max_memory_mb
+   (leaks, caches that never shrink), finishes its current task and exits,
+   and a new worker is started in its place straight away.
+
+WarmPool is a concurrent.futures.Executor, so submit(), map() and shutdown()
+work as usual. As in ProcessPoolExecutor, a worker that cannot start (a
+preload module or the initializer fails) breaks the pool: the constructor,
+or every outstanding future, raises BrokenProcessPool.
+"""
+
+
+def _memory_mb():
+    """Current resident memory of this process in MB, None where unknown."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1 << 20)
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # the peak, close enough
+    return peak / (1 << 20) if os.uname().sysname == "Darwin" else peak / 1024
+
+
+def _dumps(outcome):
+    """
+    Pickle a task's outcome in the worker.
+
+    An unpicklable result becomes the task's error here, so the future still
+    resolves instead of the message never reaching the pool.
+    """
+    try:
+        return pickle.dumps(outcome)
+    except Exception as error:
+        try:
+            return pickle.dumps((False, error))
+        except Exception:
+            return pickle.dumps((False, pickle.PicklingError(repr(error))))
+
+
+def _worker(tasks, results, slot, preload, initializer, initargs, max_tasks, max_memory_mb):
+    """The loop running in every worker process."""
+    results_pipe, results_lock = results
+
+    def send(message):
+        # Written before the next task starts, unlike Queue.put() whose feeder
+        # thread would lose the message if the process is killed right after
+        with results_lock:
+            results_pipe.send(message)
+
+    pid = os.getpid()
+    try:
+        for name in preload:
+            importlib.import_module(name)
+        if initializer is not None:
+            initializer(*initargs)
+    except BaseException as error:
+        send(("failed", pid, None, _dumps((False, error))))
+        raise SystemExit(1)
+    send(("ready", pid, None, None))
+    for done in itertools.count(1):
+        task = tasks.get()
+        if task is None:
+            return
+        task_id, payload = task
+        slot.value = task_id  # read by the pool if this process dies during the task
+        try:
+            func, args, kwargs = pickle.loads(payload)
+            outcome = (True, func(*args, **kwargs))
+        except BaseException as error:
+            outcome = (False, error)
+        retire = bool(max_tasks and done >= max_tasks) or bool(
+            max_memory_mb and (_memory_mb() or 0) > max_memory_mb)
+        send(("result", pid, task_id, _dumps(outcome)))
+        if retire:
+            send(("retired", pid, None, None))
+            return
+
+
+def _fail(future, error):
+    if future.running() or future.set_running_or_notify_cancel():
+        future.set_exception(error)
+
+
+class WarmPool(concurrent.futures.Executor):
+    """A process pool with pre-imported modules and worker recycling."""
+
+    def __init__(self, workers=None, preload=(), initializer=None, initargs=(), max_tasks=None,
+                 max_memory_mb=None, start_method=None):
+        """
+        Start the workers and wait until every one of them is ready.
+
+        Raises BrokenProcessPool when a worker cannot start, e.g. because a
+        preload module fails to import or the initializer raises.
+
+        Args:
+            workers: Number of worker processes, os.cpu_count() by default
+            preload: Names of modules every worker imports at start-up
+            initializer: Function every worker calls once after the imports
+            initargs: Arguments for initializer
+            max_tasks: Replace a worker after it ran this many tasks
+            max_memory_mb: Replace a worker whose memory grew past this
+            start_method: "fork", "spawn" or "forkserver"; the platform default otherwise
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.preload = tuple(preload)
+        self._context = multiprocessing.get_context(start_method)
+        if self._context.get_start_method() == "forkserver":
+            self._context.set_forkserver_preload(list(self.preload))
+        self._worker_args = (self.preload, initializer, initargs, max_tasks, max_memory_mb)
+        self._tasks = self._context.Queue()
+        self._results, results_pipe = self._context.Pipe(duplex=False)
+        self._results_writer = (results_pipe, self._context.Lock())  # shared by all workers
+        self._futures = {}  # task id -> Future, until its result arrives
+        self._pending = collections.deque()  # (task id, payload) not yet handed to a worker
+        self._in_flight = 0  # tasks handed to the workers without a result yet
+        self._task_ids = itertools.count()
+        self._processes = {}  # pid -> (Process, shared slot with the id of its current task)
+        self._ready = set()  # pids of the workers that finished starting up
+        self._lock = threading.Lock()
+        self._shutdown = False
+        self._stopping = False  # the stop markers have been sent
+        self._broken = None  # why the pool cannot run tasks any more
+        self.recycled = 0
+        self.tasks_done = 0
+
+        start = time.perf_counter()
+        for _ in range(self.workers):
+            self._start_worker()
+        while len(self._ready) < self.workers and not self._broken:
+            if self._results.poll(0.1):
+                self._handle(self._results.recv())  # "ready", or "failed"
+            elif any(not process.is_alive() for process, _ in self._processes.values()):
+                self._break("a worker process died during start-up")
+        if self._broken:
+            raise concurrent.futures.process.BrokenProcessPool(self._broken)
+        self.startup_seconds = time.perf_counter() - start
+
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+
+    def _start_worker(self):
+        slot = self._context.Value("q", -1, lock=False)
+        args = (self._tasks, self._results_writer, slot) + self._worker_args
+        process = self._context.Process(target=_worker, args=args, daemon=True)
+        process.start()
+        self._processes[process.pid] = (process, slot)
+
+    def submit(self, fn, /, *args, **kwargs):
+        future = concurrent.futures.Future()
+        try:
+            # Pickled here: Queue.put() would fail in its feeder thread, out of reach
+            payload = pickle.dumps((fn, args, kwargs))
+        except Exception as error:
+            future.set_exception(error)
+            return future
+        with self._lock:
+            if self._broken:
+                raise concurrent.futures.process.BrokenProcessPool(self._broken)
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            task_id = next(self._task_ids)
+            self._futures[task_id] = future
+            self._pending.append((task_id, payload))
+            self._dispatch()
+        return future
+
+    def _dispatch(self):
+        """
+        Hand pending tasks to the workers, one more than there are workers.
+        Called with self._lock held.
+
+        Like in ProcessPoolExecutor, a task counts as running from here on:
+        cancel() fails from now, and a task cancelled before it got here is
+        dropped without running.
+        """
+        while self._pending and self._in_flight <= self.workers:
+            task_id, payload = self._pending.popleft()
+            if not self._futures[task_id].set_running_or_notify_cancel():
+                del self._futures[task_id]  # cancelled
+                continue
+            self._tasks.put((task_id, payload))
+            self._in_flight += 1
+        if self._shutdown and not self._pending and not self._stopping:
+            self._stopping = True
+            for _ in range(self.workers):
+                self._tasks.put(None)  # each worker stops after the tasks queued before it
+
+    def _finished(self, task_id):
+        """The Future of a task that is over, None when it is not outstanding."""
+        with self._lock:
+            future = self._futures.pop(task_id, None)
+            if future is not None:
+                self._in_flight -= 1
+                self._dispatch()
+        return future
+
+    def _handle(self, message):
+        kind, pid, task_id, outcome = message
+        if kind == "result":
+            future = self._finished(task_id)
+            self.tasks_done += 1
+            if future is None:
+                return
+            try:
+                ok, value = pickle.loads(outcome)
+            except Exception as error:
+                ok, value = False, error
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+        elif kind == "ready":
+            self._ready.add(pid)
+        elif kind == "failed":
+            try:
+                error = pickle.loads(outcome)[1]
+            except Exception as unpickling_error:
+                error = unpickling_error
+            self._break(f"worker process {pid} failed to start: {error!r}")
+        elif kind == "retired":
+            process, _ = self._processes.pop(pid)
+            self._ready.discard(pid)
+            process.join()
+            self.recycled += 1
+            # Replaced during shutdown too: the tasks still queued and this
+            # worker's stop marker need a process to take them
+            self._start_worker()
+
+    def _break(self, reason):
+        """A worker cannot start: stop all workers and fail every outstanding task."""
+        with self._lock:
+            self._broken = reason
+            self._pending.clear()
+            futures = list(self._futures.values())
+            self._futures.clear()
+        for process, _ in self._processes.values():
+            process.terminate()
+        for process, _ in self._processes.values():
+            process.join()
+        for future in futures:
+            _fail(future, concurrent.futures.process.BrokenProcessPool(reason))
+
+    def _collect(self):
+        """Collector thread: route results to their futures and watch the workers."""
+        while not self._broken:
+            if self._results.poll(0.1):
+                self._handle(self._results.recv())
+            elif self._check_workers():
+                return
+
+    def _check_workers(self):
+        """Replace workers that died; True once the pool has shut down completely."""
+        if all(process.is_alive() for process, _ in self._processes.values()):
+            return False
+        # A worker that retired has exited, but its "retired" message may have
+        # arrived after the last poll(): handle everything sent before judging.
+        # Workers write their messages before they exit, so nothing comes later.
+        while self._results.poll() and not self._broken:
+            self._handle(self._results.recv())
+        for pid, (process, slot) in list(self._processes.items()):
+            if self._broken:
+                return True
+            if process.is_alive() or (self._shutdown and process.exitcode == 0):
+                continue  # still running, or stopped by its stop marker
+            if pid not in self._ready:
+                # A replacement that cannot start would only be replaced again
+                self._break(f"worker process {pid} died during start-up")
+                return True
+            # Died in the middle of a task (killed, segfault, out of memory):
+            # that task fails, the ones still queued go to the replacement
+            del self._processes[pid]
+            self._ready.discard(pid)
+            self._start_worker()
+            future = self._finished(slot.value)
+            if future is not None:
+                future.set_exception(concurrent.futures.BrokenExecutor(
+                    f"worker process {pid} died while running this task"))
+        return self._shutdown and not any(process.is_alive()
+                                          for process, _ in self._processes.values())
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        with self._lock:
+            if self._shutdown:
+                return
+            self._shutdown = True
+            if cancel_futures:
+                for future in self._futures.values():
+                    future.cancel()  # only works for tasks not handed to a worker yet
+            if not self._broken:
+                self._dispatch()  # drops the cancelled tasks, sends the stop markers when done
+        if wait:
+            self._collector.join()
+            for process, _ in self._processes.values():
+                process.join()
+            # Only a task whose worker died unnoticed can be left; it will never run
+            with self._lock:
+                futures = list(self._futures.values())
+                self._futures.clear()
+            for future in futures:
+                _fail(future, concurrent.futures.BrokenExecutor(
+                    "the pool shut down before this task finished"))
+
+
+def _job(numbers):
+    """A small job that needs a few modules which take a while to import."""
+    import decimal
+    import email.parser
+    import json
+    return json.dumps(str(sum(decimal.Decimal(n) for n in numbers)))
+
+
+def _preload_modules():
+    for name in MODULES:
+        importlib.import_module(name)
+
+
+MODULES = ["asyncio", "decimal", "email.parser", "http.client", "json", "xml.dom.minidom",
+           "urllib.request", "logging.handlers", "concurrent.futures"]
+
+
+def _leak(size_mb):
+    """Keeps memory alive in the worker, to trigger the memory limit."""
+    _leak.kept = getattr(_leak, "kept", []) + [bytearray(size_mb << 20)]
+    return os.getpid()
+
+
+def _crash(_):
+    """Kills its own worker, like a segfault or the out-of-memory killer would."""
+    os.kill(os.getpid(), 9)
+
+
+if __name__ == "__main__":
+    jobs = 5
+    workers = 2
+    numbers = [str(n) for n in range(100)]
+    print(f"{jobs} jobs, {workers} workers, modules: {', '.join(MODULES)}")
+
+    for method in ("spawn", "fork"):
+        if method not in multiprocessing.get_all_start_methods():
+            continue
+        context = multiprocessing.get_context(method)
+        start = time.perf_counter()
+        for _ in range(jobs):
+            # A new pool per job, each worker importing the modules itself
+            with concurrent.futures.ProcessPoolExecutor(workers, mp_context=context,
+                                                        initializer=_preload_modules) as pool:
+                list(pool.map(_job, [numbers] * workers))
+        cold = (time.perf_counter() - start) / jobs
+
+        start = time.perf_counter()
+        with WarmPool(workers, preload=MODULES, start_method=method) as pool:
+            ready = time.perf_counter() - start
+            job_times = []
+            for _ in range(jobs):
+                job_start = time.perf_counter()
+                list(pool.map(_job, [numbers] * workers))
+                job_times.append(time.perf_counter() - job_start)
+        warm = sum(job_times) / jobs
+        print(f"  {method:<6} cold pool per job {cold * 1000:>7.1f} ms   warm pool: start-up "
+              f"{ready * 1000:>6.1f} ms once, then {warm * 1000:>5.1f} ms per job")
+
+    # Recycling after a number of tasks and after a memory limit
+    with WarmPool(2, max_tasks=3) as pool:
+        pids = set(pool.map(_leak, [0] * 12))
+        print(f"max_tasks=3: 12 tasks ran in {len(pids)} different processes, "
+              f"{pool.recycled} recycled")
+    with WarmPool(1, max_memory_mb=(_memory_mb() or 0) + 100) as pool:
+        pids = [pool.submit(_leak, 40).result() for _ in range(6)]
+        print(f"max_memory_mb: workers {sorted(set(pids), key=pids.index)}, {pool.recycled} recycled")
+
+    # shutdown() waits for every queued task, even when workers retire on the way
+    pool = WarmPool(2, max_tasks=2)
+    futures = [pool.submit(_leak, 0) for _ in range(10)]
+    pool.shutdown(wait=True)
+    print(f"after shutdown: {sum(future.done() for future in futures)} of 10 tasks done")
+
+    # A dead worker fails only the task it was running; the rest still run
+    with WarmPool(2) as pool:
+        futures = [pool.submit(_leak, 0) for _ in range(5)] + [pool.submit(_crash, None)]
+        futures += [pool.submit(_leak, 0) for _ in range(5)]
+        failed = [future for future in futures if future.exception() is not None]
+        print(f"worker killed: {len(failed)} task failed "
+              f"({type(failed[0].exception()).__name__}), {len(futures) - len(failed)} succeeded")
@@ -0,0 +1,242 @@
+import collections
+import threading
+import time
+
+"""
+A producer/consumer queue that moves items in batches.
+
+queue.Queue in code.py hands over one item per put() and get(), and each call
+takes the queue's lock and signals a condition variable: with small items that
+overhead is most of the work. BatchQueue lets producers put whole lists and
+lets a consumer take up to max_batch items in one get_batch(), so the lock and
+the wake-up are paid once per batch.
+
+Waiting for a full batch would hold up items when traffic is slow, so
+max_latency caps how long the first item of a batch may wait: a consumer takes
+what is there once the oldest item is that old.
+
+close() replaces the None sentinel of code.py. With one sentinel only one
+consumer stops; after close() every consumer gets the items that are left and
+then an empty list, which ends its loop.
+"""
+
+
+class QueueClosed(Exception):
+    """put() was called after close()."""
+
+
+class BatchQueue:
+    """Thread-safe queue with batched puts and gets and a clean shutdown."""
+
+    def __init__(self, maxsize=0, max_batch=1000, max_latency=None):
+        """
+        Args:
+            maxsize: Maximum number of items in the queue, 0 for no limit
+            max_batch: Maximum number of items one get_batch() returns
+            max_latency: Seconds a consumer waits for a batch to fill up after
+                the first item arrived; None takes whatever is there at once
+        """
+        self.maxsize = maxsize
+        self.max_batch = max_batch
+        self.max_latency = max_latency
+        self._items = collections.deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        # (number of the put's first item, time.monotonic() of the put) for every
+        # put_many() with items still queued, oldest first
+        self._marks = collections.deque()
+        self._added = 0  # items put so far
+        self._taken = 0  # items taken so far
+        self._closed = False
+        self.puts = 0
+        self.batches = 0
+
+    def put(self, item, timeout=None):
+        self.put_many([item], timeout)
+
+    def put_many(self, items, timeout=None):
+        """
+        Add all items, waiting for room if the queue is bounded.
+
+        All or nothing: the items go in together once there is room for all of
+        them, so after TimeoutError or QueueClosed none of them is queued and
+        retrying cannot add any twice.
+
+        Args:
+            items: List (or other sequence) of items, at most maxsize of them
+            timeout: Seconds to wait for room before raising TimeoutError
+        """
+        if self.maxsize and len(items) > self.maxsize:
+            raise ValueError(f"{len(items)} items never fit in a BatchQueue of maxsize "
+                             f"{self.maxsize}; put them in smaller lists")
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            while True:
+                if self._closed:
+                    raise QueueClosed("put on a closed BatchQueue")
+                if not self.maxsize or len(self._items) + len(items) <= self.maxsize:
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError("no room in the BatchQueue")
+                self._not_full.wait(remaining)
+            if items:
+                self._marks.append((self._added, time.monotonic()))
+                self._added += len(items)
+                self._items.extend(items)
+                # Wake one consumer per batch that is ready, not one per item
+                self._not_empty.notify(-(-len(self._items) // self.max_batch))
+            self.puts += 1
+
+    def get_batch(self, max_items=None, timeout=None):
+        """
+        Remove and return up to max_items items (max_batch by default).
+
+        Waits for at least one item; returns an empty list once the queue is
+        closed and drained, or when timeout seconds pass without an item.
+        """
+        max_items = max_items or self.max_batch
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            while True:
+                while not self._items:
+                    if self._closed:
+                        return []
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return []
+                    self._not_empty.wait(remaining)
+                if not self.max_latency:
+                    break
+                # Give the batch time to fill, but no longer than max_latency from its first item
+                while self._items and len(self._items) < max_items and not self._closed:
+                    remaining = self._marks[0][1] + self.max_latency - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._not_empty.wait(remaining)
+                if self._items:
+                    break
+                # Another consumer took the items while we waited: start over
+            items = self._items
+            if len(items) <= max_items:
+                batch = list(items)
+                items.clear()
+                self._marks.clear()
+            else:
+                popleft = items.popleft
+                batch = [popleft() for _ in range(max_items)]
+                # The items left keep the time of their own put(), so they
+                # still leave within max_latency of arriving
+                marks = self._marks
+                while len(marks) > 1 and marks[1][0] <= self._taken + len(batch):
+                    marks.popleft()
+                self._not_empty.notify()  # more is ready for another consumer
+            self._taken += len(batch)
+            self.batches += 1
+            if self.maxsize:
+                self._not_full.notify_all()
+            return batch
+
+    def batches_until_closed(self):
+        """Yield batches until the queue is closed and empty."""
+        while True:
+            batch = self.get_batch()
+            if not batch:
+                return
+            yield batch
+
+    def close(self):
+        """No more puts; consumers finish the remaining items and then stop."""
+        with self._lock:
+            self._closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+
+    def qsize(self):
+        return len(self._items)
+
+
+if __name__ == "__main__":
+    import queue
+
+    # producer()/consumer() from code.py, with two consumers and no sentinel
+    task_queue = BatchQueue(max_batch=2, max_latency=0.2)
+
+    def producer(items):
+        for item in items:
+            task_queue.put(item)
+            time.sleep(0.05)
+        task_queue.close()
+        print("Producer: Done")
+
+    def consumer(name):
+        for batch in task_queue.batches_until_closed():
+            print(f"Consumer {name}: Got {batch} from queue")
+        print(f"Consumer {name}: Done")
+
+    threads = [threading.Thread(target=producer, args=([1, 2, 3, 4, 5],)),
+               threading.Thread(target=consumer, args=("A",)),
+               threading.Thread(target=consumer, args=("B",))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # --- Benchmark: items/sec ---
+    items = 400_000
+    producers = consumers = 2
+    chunk = 100  # items a producer has ready at a time
+
+    def run(produce, consume):
+        counts = [0] * consumers
+        threads = [threading.Thread(target=produce, args=(items // producers,))
+                   for _ in range(producers)]
+        threads += [threading.Thread(target=consume, args=(counts, i)) for i in range(consumers)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads[:producers]:
+            thread.join()
+        return counts, threads, start
+
+    def finish(counts, threads, start):
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        assert sum(counts) == items
+        return items / elapsed
+
+    plain = queue.Queue(maxsize=10_000)
+
+    def plain_produce(count):
+        for i in range(count):
+            plain.put(i)
+
+    def plain_consume(counts, index):
+        while plain.get() is not None:
+            counts[index] += 1
+
+    counts, threads, start = run(plain_produce, plain_consume)
+    for _ in range(consumers):
+        plain.put(None)  # one sentinel per consumer
+    print(f"{'queue.Queue':<36} {finish(counts, threads, start):>12,.0f} items/sec")
+
+    for max_batch, max_latency in ((100, None), (1000, None), (1000, 0.001)):
+        batched = BatchQueue(maxsize=10_000, max_batch=max_batch, max_latency=max_latency)
+
+        def batched_produce(count):
+            block = list(range(chunk))
+            for _ in range(count // chunk):
+                batched.put_many(block)
+
+        def batched_consume(counts, index):
+            for batch in batched.batches_until_closed():
+                counts[index] += len(batch)
+
+        counts, threads, start = run(batched_produce, batched_consume)
+        batched.close()
+        rate = finish(counts, threads, start)
+        label = f"BatchQueue batch={max_batch} latency={max_latency}"
+        print(f"{label:<36} {rate:>12,.0f} items/sec  "
+              f"({items / batched.batches:.0f} items per get)")
@@ -0,0 +1,390 @@
+import collections
+import threading
+import time
+
+"""
+Drop-in Lock, RLock, Semaphore, Condition and Barrier that measure themselves.
+
+When threads are slower than expected, the question is usually which lock
+they are queueing on. Each instrumented primitive has a name and records in
+a shared registry:
+
+- acquisitions: how often it was acquired
+- contended: how many of those had to wait because someone else held it
+- wait time: total and longest time threads spent waiting to get it
+- hold time: total and longest time it was held, i.e. how long the critical
+  section really takes
+
+registry.report() lists the locks with the most waiting first: those are the
+ones capping the throughput. Replacing threading.Lock() with
+InstrumentedLock("name") is the only change needed in the code being
+investigated. The measuring adds a few microseconds per acquire, so swap the
+plain primitives back in once the culprit is found.
+"""
+
+
+class LockStats:
+    """Counters for one named primitive."""
+
+    def __init__(self, name, kind):
+        self.name = name
+        self.kind = kind
+        self.acquisitions = 0
+        self.contended = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_hold = 0.0
+        self.max_hold = 0.0
+        self._lock = threading.Lock()  # for primitives several threads can hold at once
+
+    def record_wait(self, waited, contended, acquired=True):
+        if not acquired:
+            self.timeouts += 1
+        else:
+            self.acquisitions += 1
+        if contended:
+            self.contended += 1
+            self.total_wait += waited
+            if waited > self.max_wait:
+                self.max_wait = waited
+
+    def record_hold(self, held):
+        self.total_hold += held
+        if held > self.max_hold:
+            self.max_hold = held
+
+
+class LockRegistry:
+    """All LockStats by name; primitives with the same name share one entry."""
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def get(self, name, kind):
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = LockStats(name, kind)
+            return stats
+
+    def stats(self):
+        """List of LockStats, the most waited on first."""
+        with self._lock:
+            return sorted(self._stats.values(), key=lambda stats: -stats.total_wait)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def report(self):
+        lines = [f"{'name':<20} {'kind':<10} {'acquired':>9} {'contended':>10} "
+                 f"{'wait total':>11} {'wait max':>9} {'hold total':>11} {'hold max':>9}"]
+        for stats in self.stats():
+            share = stats.contended / stats.acquisitions if stats.acquisitions else 0.0
+            lines.append(
+                f"{stats.name:<20} {stats.kind:<10} {stats.acquisitions:>9} "
+                f"{stats.contended:>5} {share:>4.0%} {stats.total_wait * 1000:>9.1f}ms "
+                f"{stats.max_wait * 1000:>7.1f}ms {stats.total_hold * 1000:>9.1f}ms "
+                f"{stats.max_hold * 1000:>7.1f}ms")
+        return "\n".join(lines)
+
+
+registry = LockRegistry()
+
+
+def _timed_acquire(lock, blocking, timeout):
+    """Acquire lock; returns (acquired, seconds waited, had to wait)."""
+    if lock.acquire(False):
+        return True, 0.0, False  # free: the common, cheap case
+    if not blocking:
+        return False, 0.0, True
+    start = time.perf_counter()
+    acquired = lock.acquire(True, timeout)
+    return acquired, time.perf_counter() - start, True
+
+
+class InstrumentedLock:
+    """threading.Lock that records wait and hold times."""
+
+    _kind = "Lock"
+
+    def __init__(self, name, registry=registry):
+        """
+        Args:
+            name: Name in the report; locks with the same name are added up
+            registry: LockRegistry to record in
+        """
+        self.name = name
+        self.stats = registry.get(name, self._kind)
+        self._lock = self._make_lock()
+        self._owner = None
+        self._acquired_at = 0.0
+
+    def _make_lock(self):
+        return threading.Lock()
+
+    def acquire(self, blocking=True, timeout=-1):
+        acquired, waited, contended = _timed_acquire(self._lock, blocking, timeout)
+        if acquired:
+            # We hold the lock now, so these updates cannot race
+            self.stats.record_wait(waited, contended)
+            self._owner = threading.get_ident()
+            self._acquired_at = time.perf_counter()
+        else:
+            with self.stats._lock:
+                self.stats.record_wait(waited, contended, acquired=False)
+        return acquired
+
+    def release(self):
+        self.stats.record_hold(time.perf_counter() - self._acquired_at)
+        self._owner = None
+        self._lock.release()
+
+    def locked(self):
+        return self._lock.locked()
+
+    def _is_owned(self):
+        """Used by threading.Condition."""
+        return self._owner == threading.get_ident()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+class InstrumentedRLock(InstrumentedLock):
+    """threading.RLock that records wait and hold times of the outermost acquire."""
+
+    _kind = "RLock"
+
+    def __init__(self, name, registry=registry):
+        super().__init__(name, registry)
+        self._depth = 0
+
+    def _make_lock(self):
+        return threading.RLock()
+
+    def acquire(self, blocking=True, timeout=-1):
+        if self._owner == threading.get_ident():  # re-entry: never waits, not a new hold
+            self._lock.acquire()
+            self._depth += 1
+            return True
+        acquired = super().acquire(blocking, timeout)
+        if acquired:
+            self._depth = 1
+        return acquired
+
+    def release(self):
+        if self._owner != threading.get_ident():
+            raise RuntimeError("cannot release un-acquired lock")
+        self._depth -= 1
+        if self._depth:
+            self._lock.release()
+        else:
+            super().release()
+
+    def locked(self):
+        return self._owner is not None
+
+    def _release_save(self):
+        """Used by Condition.wait(): let go of every level at once."""
+        self.stats.record_hold(time.perf_counter() - self._acquired_at)
+        state = (self._depth, self._lock._release_save())
+        self._owner = None
+        self._depth = 0
+        return state
+
+    def _acquire_restore(self, state):
+        depth, inner = state
+        start = time.perf_counter()
+        self._lock._acquire_restore(inner)
+        self.stats.record_wait(time.perf_counter() - start, False)
+        self._owner = threading.get_ident()
+        self._depth = depth
+        self._acquired_at = time.perf_counter()
+
+
+class InstrumentedSemaphore:
+    """threading.Semaphore that records wait and hold times."""
+
+    _kind = "Semaphore"
+
+    def __init__(self, value=1, name="semaphore", registry=registry):
+        """
+        Args:
+            value: Number of threads that may hold it at the same time
+            name: Name in the report
+            registry: LockRegistry to record in
+        """
+        self.name = name
+        self.stats = registry.get(name, self._kind)
+        self._semaphore = self._make_semaphore(value)
+        # A semaphore may be released by another thread than the one that took
+        # it, so hold times pair each release with the oldest acquire
+        self._acquired_at = collections.deque()
+
+    def _make_semaphore(self, value):
+        return threading.Semaphore(value)
+
+    def acquire(self, blocking=True, timeout=None):
+        acquired, waited, contended = _timed_acquire(
+            self._semaphore, blocking, timeout)
+        with self.stats._lock:
+            self.stats.record_wait(waited, contended, acquired)
+        if acquired:
+            self._acquired_at.append(time.perf_counter())
+        return acquired
+
+    def release(self, n=1):
+        now = time.perf_counter()
+        with self.stats._lock:
+            for _ in range(n):
+                if self._acquired_at:
+                    self.stats.record_hold(now - self._acquired_at.popleft())
+        self._semaphore.release(n)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+class InstrumentedBoundedSemaphore(InstrumentedSemaphore):
+    _kind = "Bounded"
+
+    def _make_semaphore(self, value):
+        return threading.BoundedSemaphore(value)
+
+
+class InstrumentedCondition(threading.Condition):
+    """
+    threading.Condition on an instrumented lock.
+
+    The lock's entry in the report covers the with-block; waiting for notify()
+    is recorded separately, under the name with " (wait)" added.
+    """
+
+    def __init__(self, lock=None, name="condition", registry=registry):
+        """
+        Args:
+            lock: InstrumentedLock or InstrumentedRLock; a new InstrumentedRLock
+                named name by default
+            name: Name in the report
+            registry: LockRegistry to record in
+        """
+        super().__init__(lock if lock is not None else InstrumentedRLock(name, registry))
+        self.name = name
+        self.wait_stats = registry.get(f"{name} (wait)", "Condition")
+
+    def wait(self, timeout=None):
+        start = time.perf_counter()
+        notified = super().wait(timeout)
+        # Condition.wait() returns holding the lock again, so the update is safe
+        self.wait_stats.record_wait(time.perf_counter() - start, True, notified)
+        return notified
+
+
+class InstrumentedBarrier(threading.Barrier):
+    """threading.Barrier that records how long each thread waited for the others."""
+
+    def __init__(self, parties, action=None, timeout=None, name="barrier", registry=registry):
+        super().__init__(parties, action, timeout)
+        self.name = name
+        self.stats = registry.get(name, "Barrier")
+
+    def wait(self, timeout=None):
+        start = time.perf_counter()
+        try:
+            index = super().wait(timeout)
+        except threading.BrokenBarrierError:
+            with self.stats._lock:
+                self.stats.record_wait(time.perf_counter() - start, True, acquired=False)
+            raise
+        with self.stats._lock:
+            # The last thread to arrive (index parties - 1) did not wait for anybody
+            self.stats.record_wait(time.perf_counter() - start, index != self.parties - 1)
+        return index
+
+
+def report():
+    return registry.report()
+
+
+if __name__ == "__main__":
+    # increment_with_context from code.py, with four threads and the lock instrumented
+    counter = 0
+    counter_lock = InstrumentedLock("counter_lock")
+
+    def increment_with_context(amount, repeats):
+        global counter
+        for _ in range(repeats):
+            with counter_lock:
+                counter += amount
+                time.sleep(0.001)  # work done while holding the lock
+
+    # The same with the work moved out of the critical section
+    fixed_counter = 0
+    fixed_lock = InstrumentedLock("fixed_lock")
+
+    def increment_fixed(amount, repeats):
+        global fixed_counter
+        for _ in range(repeats):
+            time.sleep(0.001)
+            with fixed_lock:
+                fixed_counter += amount
+
+    semaphore = InstrumentedSemaphore(2, name="semaphore")
+
+    def semaphore_task():
+        with semaphore:
+            time.sleep(0.05)
+
+    reentrant_lock = InstrumentedRLock("reentrant_lock")
+
+    def outer_function():
+        with reentrant_lock:
+            with reentrant_lock:  # re-entry is not counted as a new acquisition
+                time.sleep(0.01)
+
+    condition = InstrumentedCondition(name="condition")
+    shared_resource = []
+
+    def consumer_with_condition():
+        with condition:
+            while not shared_resource:
+                condition.wait()
+            shared_resource.pop(0)
+
+    def producer_with_condition():
+        time.sleep(0.05)
+        with condition:
+            shared_resource.append("item")
+            condition.notify()
+
+    barrier = InstrumentedBarrier(3, name="barrier")
+
+    def barrier_task(delay):
+        time.sleep(delay)
+        barrier.wait()
+
+    threads = [threading.Thread(target=increment_with_context, args=(1, 50)) for _ in range(4)]
+    threads += [threading.Thread(target=increment_fixed, args=(1, 50)) for _ in range(4)]
+    threads += [threading.Thread(target=semaphore_task) for _ in range(5)]
+    threads += [threading.Thread(target=outer_function) for _ in range(3)]
+    threads += [threading.Thread(target=consumer_with_condition),
+                threading.Thread(target=producer_with_condition)]
+    threads += [threading.Thread(target=barrier_task, args=(delay,)) for delay in (0, 0.05, 0.1)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(f"counter {counter}, fixed_counter {fixed_counter}")
+    print(report())
@@ -0,0 +1,222 @@
+import collections
+import concurrent.futures
+import os
+import random
+import threading
+import time
+
+"""
+A thread pool where every worker has its own task deque and idle workers steal.
+
+ThreadPoolExecutor in code.py keeps all pending tasks in one queue that every
+worker and every submit() goes through. With many tiny tasks the workers keep
+meeting at that queue.
+
+WorkStealingExecutor gives each worker its own deque:
+
+1. A task submitted by a worker (a task spawning subtasks) goes on that
+   worker's own deque, so related work stays on one thread. submit() from
+   outside the pool puts tasks on a shared injection deque instead.
+2. A worker takes its newest own task from the right end of its deque (LIFO:
+   the subtask it just created, its data still in the cache). With its deque
+   empty it takes the oldest task from the injection deque, so outside tasks
+   run first come, first served. With both empty it steals the oldest task
+   from the left end of another worker's deque.
+3. deque.append() and deque.pop()/popleft() are atomic, so workers take and
+   steal tasks without a lock. submit() holds the condition variable's lock
+   only while it checks for shutdown and appends; otherwise the condition
+   variable just puts workers to sleep when there is nothing to do anywhere.
+
+It works with everything that accepts a concurrent.futures.Executor: submit(),
+map() and shutdown() behave the same way.
+
+Measure before switching. With the GIL only one worker runs Python code at a
+time, so the shared queue of ThreadPoolExecutor is rarely the real bottleneck
+and the benchmark below shows both pools close together; its latency is
+mostly queueing, as every task is submitted at once. The design pays off when
+tasks spawn subtasks and on free-threaded Python builds with many cores.
+"""
+
+
+class _WorkItem:
+    __slots__ = ("future", "fn", "args", "kwargs")
+
+    def __init__(self, future, fn, args, kwargs):
+        self.future = future
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+
+    def run(self):
+        if not self.future.set_running_or_notify_cancel():
+            return
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except BaseException as error:
+            self.future.set_exception(error)
+        else:
+            self.future.set_result(result)
+
+
+class WorkStealingExecutor(concurrent.futures.Executor):
+    """Executor with one deque per worker thread and work stealing."""
+
+    def __init__(self, max_workers=None, thread_name_prefix="WorkStealing"):
+        """
+        Args:
+            max_workers: Number of worker threads, same default as ThreadPoolExecutor
+            thread_name_prefix: Names of the threads are prefix-0, prefix-1, ...
+        """
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        self._deques = [collections.deque() for _ in range(self.max_workers)]
+        self._injected = collections.deque()  # tasks submitted from outside the pool
+        self._local = threading.local()  # .index is set in worker threads
+        self._wakeup = threading.Condition()
+        self._idle = 0
+        self._shutdown = False
+        self.steals = 0
+        self._threads = [threading.Thread(target=self._work, args=(index,), daemon=True,
+                                          name=f"{thread_name_prefix}-{index}")
+                         for index in range(self.max_workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, fn, /, *args, **kwargs):
+        future = concurrent.futures.Future()
+        item = _WorkItem(future, fn, args, kwargs)
+        index = getattr(self._local, "index", None)
+        tasks = self._injected if index is None else self._deques[index]
+        # Checked and queued under the lock: a task queued after shutdown() let
+        # the workers exit would never run
+        with self._wakeup:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            tasks.append(item)
+            # Only the first task in a deque wakes a worker: the woken worker
+            # keeps taking and stealing until every deque is empty before it
+            # sleeps again, and wakes another one while outside tasks are
+            # still waiting
+            if self._idle and len(tasks) == 1:
+                self._wakeup.notify()
+        return future
+
+    def _find_work(self, index):
+        """
+        Pop from our own deque, else take the oldest outside task, else steal
+        from the others starting at a random one.
+        """
+        try:
+            return self._deques[index].pop()
+        except IndexError:
+            pass
+        try:
+            item = self._injected.popleft()
+        except IndexError:
+            pass
+        else:
+            if self._idle and self._injected:
+                with self._wakeup:  # a Condition's lock is reentrant, _work() may hold it
+                    self._wakeup.notify()
+            return item
+        count = self.max_workers
+        start = random.randrange(count)
+        for offset in range(count):
+            victim = self._deques[(start + offset) % count]
+            if victim:
+                try:
+                    item = victim.popleft()
+                except IndexError:  # emptied by someone else in the meantime
+                    continue
+                self.steals += 1
+                return item
+        return None
+
+    def _work(self, index):
+        self._local.index = index
+        while True:
+            item = self._find_work(index)
+            if item is not None:
+                item.run()
+                del item
+                continue
+            with self._wakeup:
+                self._idle += 1
+                try:
+                    # Look once more while holding the lock, so a submit() in between is not missed
+                    item = self._find_work(index)
+                    while item is None and not self._shutdown:
+                        self._wakeup.wait()
+                        item = self._find_work(index)
+                finally:
+                    self._idle -= 1
+            if item is None:  # shut down and nothing left
+                return
+            item.run()
+            del item
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        with self._wakeup:
+            self._shutdown = True
+            if cancel_futures:
+                for tasks in [self._injected] + self._deques:
+                    while tasks:
+                        try:
+                            tasks.popleft().future.cancel()
+                        except IndexError:
+                            break
+            self._wakeup.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+
+def _benchmark(executor_type, workers, durations):
+    """
+    Run one task per duration (seconds of sleep, 0 for a tiny task).
+
+    Returns (tasks per second, p50 latency, p99 latency), where latency is the
+    time from submit() until the task finished.
+    """
+    latencies = []
+
+    def task(duration, submitted):
+        if duration:
+            time.sleep(duration)
+        latencies.append(time.perf_counter() - submitted)
+
+    start = time.perf_counter()
+    with executor_type(workers) as executor:
+        for duration in durations:
+            executor.submit(task, duration, time.perf_counter())
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return (len(durations) / elapsed, latencies[len(latencies) // 2],
+            latencies[int(len(latencies) * 0.99)])
+
+
+if __name__ == "__main__":
+    def task_function(name):
+        print(f"Task {name}: Starting")
+        time.sleep(1)
+        print(f"Task {name}: Completed")
+        return f"Result {name}"
+
+    # The ThreadPoolExecutor example from code.py, unchanged apart from the class
+    with WorkStealingExecutor(max_workers=3) as executor:
+        future1 = executor.submit(task_function, "A")
+        print(f"Result from future1: {future1.result()}")
+        for result in executor.map(task_function, ["D", "E", "F"]):
+            print(f"Map result: {result}")
+
+    random.seed(1)
+    workloads = {
+        "tiny (100k no-op tasks)": [0] * 100_000,
+        "skewed (1 in 100 sleeps 20 ms)": [0.02 if random.random() < 0.01 else 0
+                                           for _ in range(20_000)],
+    }
+    for label, durations in workloads.items():
+        print(label)
+        for executor_type in (concurrent.futures.ThreadPoolExecutor, WorkStealingExecutor):
+            rate, p50, p99 = _benchmark(executor_type, 8, durations)
+            print(f"  {executor_type.__name__:<22} {rate:>10,.0f} tasks/sec  "
+                  f"latency p50 {p50 * 1000:>7.2f} ms  p99 {p99 * 1000:>7.2f} ms")
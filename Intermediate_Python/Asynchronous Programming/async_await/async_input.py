@@ -0,0 +1,191 @@
+import asyncio
+import atexit
+import collections
+import os
+import sys
+import threading
+
+"""
+A non-blocking replacement for input() inside coroutines.
+
+input() blocks the whole thread, and the event loop runs in that thread, so
+while Teacher() waits for the keyboard no other task can run: the "concurrent"
+tasks in code.py end up taking turns. AsyncLineReader waits for input the
+asyncio way instead:
+
+1. On POSIX, for pipes, terminals and sockets, the file descriptor is switched
+   to non-blocking mode and registered with loop.add_reader(); the loop calls
+   us back when there is something to read.
+2. Where that is not possible (Windows, regular files), a daemon thread does
+   the blocking reads and hands the data to the loop with call_soon_threadsafe().
+
+Either way, coroutines waiting for a line are served in the order they asked.
+"""
+
+
+class AsyncLineReader:
+    """Read lines from stdin (or any file descriptor) without blocking the loop."""
+
+    def __init__(self, source=None, encoding="utf-8"):
+        """
+        Args:
+            source: File object or file descriptor, sys.stdin by default
+            encoding: Encoding of the incoming text
+        """
+        source = sys.stdin if source is None else source
+        self._source = source  # keeps a file object (and so its descriptor) open
+        self.fd = source if isinstance(source, int) else source.fileno()
+        self.encoding = encoding
+        self.mode = None  # "add_reader" or "thread", chosen on first use
+        self._loop = None
+        self._lines = collections.deque()  # complete lines nobody asked for yet
+        self._waiters = collections.deque()  # futures of coroutines waiting for a line
+        self._partial = b""
+        self._eof = False
+        self._was_blocking = None
+
+    def _start(self):
+        self._loop = asyncio.get_running_loop()
+        try:
+            self._was_blocking = os.get_blocking(self.fd)
+            os.set_blocking(self.fd, False)
+            self._loop.add_reader(self.fd, self._on_readable)
+            self.mode = "add_reader"
+        except (NotImplementedError, OSError, ValueError):
+            # Proactor loop on Windows, or a regular file (epoll refuses those)
+            if self._was_blocking is not None:
+                os.set_blocking(self.fd, self._was_blocking)
+            self._was_blocking = None
+            threading.Thread(target=self._read_in_thread, daemon=True).start()
+            self.mode = "thread"
+
+    def _on_readable(self):
+        """Called by the loop when the descriptor has data (or hit end of file)."""
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return
+        self._feed(data)
+
+    def _read_in_thread(self):
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except OSError:
+                data = b""
+            try:
+                self._loop.call_soon_threadsafe(self._feed, data)
+            except RuntimeError:
+                return  # the loop is closed
+            if not data:
+                return
+
+    def _feed(self, data):
+        """Split incoming data into lines and hand them to waiting coroutines."""
+        if not data:
+            self._eof = True
+            if self.mode == "add_reader":
+                self._loop.remove_reader(self.fd)
+            if self._partial:
+                self._deliver(self._partial)
+                self._partial = b""
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if not waiter.done():
+                    waiter.set_result("")
+            return
+        *lines, self._partial = (self._partial + data).split(b"\n")
+        for line in lines:
+            self._deliver(line + b"\n")
+
+    def _deliver(self, line):
+        text = line.decode(self.encoding)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():  # skip coroutines that were cancelled while waiting
+                waiter.set_result(text)
+                return
+        self._lines.append(text)
+
+    async def readline(self):
+        """Return the next line including its newline, or "" at end of input."""
+        if self.mode is None:
+            self._start()
+        if self._lines:
+            return self._lines.popleft()
+        if self._eof:
+            return ""
+        waiter = self._loop.create_future()
+        self._waiters.append(waiter)
+        return await waiter
+
+    def close(self):
+        """Stop watching the descriptor and restore its blocking mode."""
+        if self.mode == "add_reader" and not self._eof:
+            self._loop.remove_reader(self.fd)
+        if self._was_blocking is not None:
+            os.set_blocking(self.fd, self._was_blocking)
+            self._was_blocking = None
+
+
+_stdin_reader = None
+
+
+async def ainput(prompt=""):
+    """Like input(), but awaitable: other tasks keep running while it waits."""
+    global _stdin_reader
+    if _stdin_reader is None or _stdin_reader._loop is not asyncio.get_running_loop():
+        if _stdin_reader is not None:
+            _stdin_reader.close()  # left over from an earlier asyncio.run()
+        _stdin_reader = AsyncLineReader()
+        # A terminal left in non-blocking mode confuses the shell after we exit
+        atexit.register(_stdin_reader.close)
+    if prompt:
+        print(prompt, end="", flush=True)
+    line = await _stdin_reader.readline()
+    if not line:
+        raise EOFError("EOF when reading a line")
+    return line.rstrip("\n")
+
+
+def check_overlap(delay=0.5):
+    """
+    Feed scripted input through a pipe to two coroutines shaped like Teacher()
+    and Student() and check that they overlap: the wall time must be close to
+    the longest coroutine, not the sum of both.
+    """
+    import time
+
+    read_end, write_end = os.pipe()
+    reader = AsyncLineReader(read_end)
+
+    async def person(role):
+        name = (await reader.readline()).strip()
+        await asyncio.sleep(delay)
+        age = int(await reader.readline())
+        return role, name, age
+
+    async def main():
+        tasks = [asyncio.create_task(person("Teacher")), asyncio.create_task(person("Student"))]
+        # The script arrives a little at a time, like someone typing
+        for line in ["Chandra\n", "Prakash\n", "40\n", "20\n"]:
+            os.write(write_end, line.encode())
+            await asyncio.sleep(0.01)
+        os.close(write_end)
+        return await asyncio.gather(*tasks)
+
+    start = time.perf_counter()
+    results = asyncio.run(main())
+    elapsed = time.perf_counter() - start
+    reader.close()
+    os.close(read_end)
+
+    print(results)
+    print(f"wall time {elapsed:.2f}s, longest coroutine {delay:.2f}s, sum {2 * delay:.2f}s "
+          f"(reader mode: {reader.mode})")
+    assert elapsed < 1.5 * delay, "the coroutines did not overlap"
+    return elapsed
+
+
+if __name__ == "__main__":
+    check_overlap()
@@ -1,16 +1,17 @@
 import asyncio
+from async_input import ainput  # input() would block the event loop, see async_input.py
 #defining coroutines
 async def Teacher():
-    name = input("Enter the name of the teacher: ")#2
+    name = await ainput("Enter the name of the teacher: ")#2
     await asyncio.sleep(1)#3
-    age = int(input("Enter the age of the Teacher"))
+    age = int(await ainput("Enter the age of the Teacher"))
     
     
     
 async def Student():
-    name = input("Enter the name of the Student: ")#5
+    name = await ainput("Enter the name of the Student: ")#5
     await asyncio.sleep(1)#6
-    age = int(input("Enter the age of the Student"))
+    age = int(await ainput("Enter the age of the Student"))
     
     
 async def main():
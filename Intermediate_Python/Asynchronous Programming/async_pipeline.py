@@ -0,0 +1,243 @@
+import asyncio
+import concurrent.futures
+import inspect
+import time
+
+"""
+An async pipeline for processing many files: read -> parse -> transform -> write.
+
+code.py shows tasks that only sleep. Real files need blocking calls (open,
+read, write), which would stall the event loop, so the reads are handed to a
+thread pool with run_in_executor() and the loop stays free while they run.
+
+Every stage is a group of worker tasks between two bounded asyncio.Queues:
+
+    files -> [read] -> queue -> [parse] -> queue -> [transform] -> queue -> [write]
+
+A full queue makes put() wait, so a fast stage cannot run ahead of a slow
+one and pile up chunks in memory: that is backpressure. Every stage records
+how many items it handled, how long it was busy and how deep its input queue
+was, so the report shows where the pipeline is waiting.
+"""
+
+_DONE = object()  # end-of-stream marker passed from one stage to the next
+
+
+class StageStats:
+    """Counters for one stage of the pipeline."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.bytes = 0
+        self.busy = 0.0  # seconds spent inside the stage function
+        self.depth_total = 0  # sum of input queue depths seen, for the average
+        self.depth_samples = 0
+        self.max_depth = 0
+
+    def record_depth(self, depth):
+        self.depth_total += depth
+        self.depth_samples += 1
+        self.max_depth = max(self.max_depth, depth)
+
+    def report(self, elapsed):
+        average = self.depth_total / self.depth_samples if self.depth_samples else 0.0
+        rate = self.items / elapsed if elapsed else 0.0
+        mb_rate = self.bytes / 1_000_000 / elapsed if elapsed else 0.0
+        return (f"{self.name:<10} {self.items:>8} items {rate:>10,.0f}/s {mb_rate:>8.1f} MB/s "
+                f"busy {self.busy:>6.2f}s  queue avg {average:>5.1f} max {self.max_depth:>3}")
+
+
+class Stage:
+    """One step of the pipeline: a function applied to every item."""
+
+    def __init__(self, name, func, workers=1, in_thread=False):
+        """
+        Args:
+            name: Name used in the report
+            func: Function or coroutine function called with each item; it
+                returns the item for the next stage, or None to drop it
+            workers: Number of tasks running this stage concurrently
+            in_thread: Run a plain (blocking) function in the thread pool
+                instead of on the event loop, e.g. for writes
+        """
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.in_thread = in_thread
+        self.stats = StageStats(name)
+
+
+def _size(item):
+    try:
+        return len(item)
+    except TypeError:
+        return 0
+
+
+class FilePipeline:
+    """Read many files concurrently and push their chunks through the stages."""
+
+    def __init__(self, stages, chunk_size=1 << 16, queue_size=64, readers=4, threads=8,
+                 lines=True, encoding="utf-8"):
+        """
+        Args:
+            stages: List of Stage objects, run in order after the read stage
+            chunk_size: Characters read from a file at a time
+            queue_size: Capacity of every queue between two stages
+            readers: Files read at the same time
+            threads: Size of the thread pool doing the blocking file calls
+            lines: End every chunk at a newline, so no line is split in two
+            encoding: Encoding of the input files
+        """
+        self.stages = stages
+        self.chunk_size = chunk_size
+        self.queue_size = queue_size
+        self.readers = readers
+        self.threads = threads
+        self.lines = lines
+        self.encoding = encoding
+        self.read_stats = StageStats("read")
+        self.elapsed = 0.0
+
+    async def _read_files(self, paths, output, executor):
+        """Reader task: read whole files chunk by chunk in the thread pool."""
+        loop = asyncio.get_running_loop()
+        stats = self.read_stats
+        while paths:
+            path = paths.pop()
+            file = await loop.run_in_executor(executor, lambda: open(path, encoding=self.encoding))
+            try:
+                carry = ""
+                while True:
+                    start = time.perf_counter()
+                    chunk = await loop.run_in_executor(executor, file.read, self.chunk_size)
+                    stats.busy += time.perf_counter() - start
+                    if not chunk:
+                        break
+                    if self.lines:
+                        chunk = carry + chunk
+                        cut = chunk.rfind("\n") + 1
+                        chunk, carry = chunk[:cut], chunk[cut:]
+                        if not chunk:
+                            continue
+                    stats.items += 1
+                    stats.bytes += len(chunk)
+                    await output.put((path, chunk))  # waits while the next stage is behind
+                if carry:
+                    stats.items += 1
+                    stats.bytes += len(carry)
+                    await output.put((path, carry))
+            finally:
+                await loop.run_in_executor(executor, file.close)
+
+    async def _run_stage(self, stage, queue, output, executor):
+        """Worker task of a stage: take items until the end-of-stream marker."""
+        loop = asyncio.get_running_loop()
+        is_coroutine = inspect.iscoroutinefunction(stage.func)
+        stats = stage.stats
+        while True:
+            stats.record_depth(queue.qsize())
+            item = await queue.get()
+            if item is _DONE:
+                return
+            path, data = item
+            start = time.perf_counter()
+            if is_coroutine:
+                result = await stage.func(data)
+            elif stage.in_thread:
+                result = await loop.run_in_executor(executor, stage.func, data)
+            else:
+                result = stage.func(data)
+            stats.busy += time.perf_counter() - start
+            stats.items += 1
+            stats.bytes += _size(data)
+            if result is not None and output is not None:
+                await output.put((path, result))
+
+    async def _stage_group(self, tasks, next_queue, next_workers):
+        """Wait for all workers of a stage, then tell the next stage to stop."""
+        await asyncio.gather(*tasks)
+        if next_queue is not None:
+            for _ in range(next_workers):
+                await next_queue.put(_DONE)
+
+    async def run(self, paths):
+        """Process every file; returns the report as a string."""
+        start = time.perf_counter()
+        queues = [asyncio.Queue(self.queue_size) for _ in self.stages]
+        pending_paths = list(reversed(paths))
+        executor = concurrent.futures.ThreadPoolExecutor(self.threads)
+        tasks = []
+        groups = []
+        try:
+            readers = [asyncio.create_task(self._read_files(pending_paths, queues[0], executor))
+                       for _ in range(self.readers)]
+            tasks += readers
+            groups.append(asyncio.create_task(
+                self._stage_group(readers, queues[0], self.stages[0].workers)))
+            for index, stage in enumerate(self.stages):
+                output = queues[index + 1] if index + 1 < len(self.stages) else None
+                workers = [asyncio.create_task(self._run_stage(stage, queues[index], output, executor))
+                           for _ in range(stage.workers)]
+                tasks += workers
+                next_workers = self.stages[index + 1].workers if output is not None else 0
+                groups.append(asyncio.create_task(
+                    self._stage_group(workers, output, next_workers)))
+            await asyncio.gather(*groups)
+        except BaseException:
+            for task in tasks + groups:
+                task.cancel()  # one failing stage stops the whole pipeline
+            raise
+        finally:
+            executor.shutdown(wait=True)
+        self.elapsed = time.perf_counter() - start
+        return self.report()
+
+    def report(self):
+        lines = [f"pipeline finished in {self.elapsed:.2f}s",
+                 self.read_stats.report(self.elapsed)]
+        lines += [stage.stats.report(self.elapsed) for stage in self.stages]
+        return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import os
+    import tempfile
+
+    directory = tempfile.mkdtemp()
+    paths = []
+    for i in range(20):
+        path = os.path.join(directory, f"orders{i}.log")
+        with open(path, "w") as file:
+            for n in range(20_000):
+                kind = "dosa" if n % 3 else "idly"
+                file.write(f"2024-01-01 order={n} item={kind} price={n % 90 + 10}\n")
+        paths.append(path)
+    output_path = os.path.join(directory, "dosa_orders.csv")
+    output = open(output_path, "w")
+
+    def parse(chunk):
+        rows = []
+        for line in chunk.splitlines():
+            date, order, item, price = line.split()
+            rows.append((order[6:], item[5:], int(price[6:])))
+        return rows
+
+    def transform(rows):
+        return [row for row in rows if row[1] == "dosa"] or None
+
+    def write(rows):
+        output.write("".join(f"{order},{item},{price}\n" for order, item, price in rows))
+        return len(rows)
+
+    pipeline = FilePipeline([Stage("parse", parse), Stage("transform", transform),
+                             Stage("write", write, in_thread=True)], queue_size=8)
+    print(asyncio.run(pipeline.run(paths)))
+
+    output.close()
+    with open(output_path) as file:
+        print("rows written:", sum(1 for _ in file))
+    for path in paths + [output_path]:
+        os.remove(path)
+    os.rmdir(directory)
@@ -0,0 +1,221 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+
+from task_runner import percentile
+
+"""
+Find the places where async code blocks the event loop.
+
+The event loop runs one callback at a time. A coroutine only gives the loop
+back at an await, so a blocking call inside it (input(), time.sleep(), a big
+computation, a synchronous HTTP request) freezes every other task until it
+returns. Nothing fails; everything just gets slow. LoopMonitor makes that visible:
+
+1. Lag: a heartbeat task asks to wake up every interval seconds. When it wakes
+   up late, the difference is the time the loop was busy with something else.
+2. Slow callbacks: every callback the loop runs (each step of a task is one)
+   is timed, and the ones over threshold are recorded.
+3. Stacks: by the time a slow callback has finished, its stack is gone. A
+   watchdog thread looks at the loop thread while the callback is still
+   running (sys._current_frames()) and keeps the stack of the blocking call.
+
+asyncio's debug mode (loop.slow_callback_duration) logs slow callbacks too, but
+without the stack of the line that blocked. Timing every callback costs a few
+microseconds each, so use the monitor while investigating, not all the time.
+"""
+
+
+class SlowCallback:
+    """A callback or task step that kept the loop busy for too long."""
+
+    def __init__(self, description, duration, stack):
+        self.description = description
+        self.duration = duration
+        self.stack = stack  # traceback.StackSummary taken while it was blocking, or None
+
+    def format_stack(self, limit=6):
+        if not self.stack:
+            return "    (finished before the watchdog looked)\n"
+        return "".join(traceback.format_list(self.stack[-limit:]))
+
+
+def _describe(handle):
+    callback = handle._callback
+    owner = getattr(callback, "__self__", None)
+    if isinstance(owner, asyncio.Task):  # a step of a task: name it after its coroutine
+        coro = owner.get_coro()
+        return f"task {owner.get_name()} {getattr(coro, '__qualname__', coro)}"
+    return getattr(callback, "__qualname__", repr(callback))
+
+
+def _callback_frames(stack):
+    """Drop the frames of the loop itself, keep the callback and what it called."""
+    for index in range(len(stack) - 1, -1, -1):
+        if stack[index].filename == asyncio.events.__file__ and stack[index].name == "_run":
+            return traceback.StackSummary.from_list(stack[index + 1:])
+    return stack
+
+
+class LoopMonitor:
+    """Measure event loop lag and record slow callbacks with their stacks."""
+
+    _active = None  # only one monitor can patch asyncio at a time
+
+    def __init__(self, interval=0.05, threshold=0.1, capture_stacks=True):
+        """
+        Args:
+            interval: Seconds between two heartbeats
+            threshold: Callbacks running longer than this (seconds) are recorded
+            capture_stacks: Run the watchdog thread that captures the stack of
+                a callback while it is blocking
+        """
+        self.interval = interval
+        self.threshold = threshold
+        self.capture_stacks = capture_stacks
+        self.lags = []
+        self.slow_callbacks = []
+        self.callbacks = 0
+        self.busy = 0.0  # seconds spent inside callbacks
+        self.elapsed = 0.0
+        self._loop = None
+        self._loop_thread = None
+        self._heartbeat = None
+        self._watchdog = None
+        self._stopping = threading.Event()
+        self._original_run = None
+        self._current_start = None  # set while a callback is running, read by the watchdog
+        self._current_stack = None
+        self._started = 0.0
+
+    def start(self):
+        """Start monitoring the running loop."""
+        if LoopMonitor._active is not None:
+            raise RuntimeError("another LoopMonitor is already running")
+        LoopMonitor._active = self
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._started = time.perf_counter()
+        self._patch()
+        self._heartbeat = self._loop.create_task(self._beat(), name="loop-monitor-heartbeat")
+        if self.capture_stacks:
+            self._stopping.clear()
+            self._watchdog = threading.Thread(target=self._watch, name="loop-monitor-watchdog",
+                                              daemon=True)
+            self._watchdog.start()
+
+    async def stop(self):
+        """Stop monitoring and undo the patch."""
+        if LoopMonitor._active is not self:
+            return
+        self._heartbeat.cancel()
+        try:
+            await self._heartbeat
+        except asyncio.CancelledError:
+            pass
+        self._stopping.set()
+        if self._watchdog is not None:
+            self._watchdog.join()
+        asyncio.Handle._run = self._original_run
+        LoopMonitor._active = None
+        self.elapsed = time.perf_counter() - self._started
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.stop()
+
+    def _patch(self):
+        """Wrap Handle._run, the method the loop calls to run every callback."""
+        monitor = self
+        original_run = self._original_run = asyncio.Handle._run
+        loop = self._loop
+
+        def _run(handle):
+            if handle._loop is not loop:
+                return original_run(handle)
+            monitor._current_stack = None
+            start = monitor._current_start = time.perf_counter()
+            try:
+                return original_run(handle)
+            finally:
+                duration = time.perf_counter() - start
+                monitor._current_start = None
+                monitor.callbacks += 1
+                monitor.busy += duration
+                if duration >= monitor.threshold:
+                    monitor.slow_callbacks.append(
+                        SlowCallback(_describe(handle), duration, monitor._current_stack))
+
+        asyncio.Handle._run = _run  # TimerHandle inherits it
+
+    async def _beat(self):
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(time.perf_counter() - expected, 0.0))
+
+    def _watch(self):
+        """Watchdog thread: grab the loop's stack while a callback is over the threshold."""
+        step = self.threshold / 2
+        while not self._stopping.wait(step):
+            start = self._current_start
+            if start is None or self._current_stack is not None:
+                continue
+            if time.perf_counter() - start >= self.threshold:
+                frame = sys._current_frames().get(self._loop_thread)
+                if frame is not None and self._current_start == start:
+                    self._current_stack = _callback_frames(traceback.extract_stack(frame))
+
+    def summary(self):
+        """The measurements as a dictionary of plain values (e.g. for json.dump)."""
+        lags = sorted(self.lags)
+        return {
+            "seconds": self.elapsed,
+            "heartbeats": len(lags),
+            "lag_p50": percentile(lags, 0.50),
+            "lag_p99": percentile(lags, 0.99),
+            "lag_max": lags[-1] if lags else 0.0,
+            "callbacks": self.callbacks,
+            "busy": self.busy,
+            "slow_callbacks": [
+                {"description": slow.description, "duration": slow.duration,
+                 "stack": slow.format_stack().splitlines()}
+                for slow in sorted(self.slow_callbacks, key=lambda slow: -slow.duration)],
+        }
+
+    def report(self, limit=5):
+        """Readable summary; the slowest callbacks come first."""
+        summary = self.summary()
+        lines = [f"{summary['seconds']:.2f}s monitored, {summary['callbacks']} callbacks, "
+                 f"loop busy {summary['busy']:.2f}s",
+                 f"lag p50 {summary['lag_p50'] * 1000:.1f} ms  p99 {summary['lag_p99'] * 1000:.1f} ms"
+                 f"  max {summary['lag_max'] * 1000:.1f} ms over {summary['heartbeats']} heartbeats",
+                 f"{len(self.slow_callbacks)} callbacks over {self.threshold * 1000:.0f} ms"]
+        for slow in sorted(self.slow_callbacks, key=lambda slow: -slow.duration)[:limit]:
+            lines.append(f"  {slow.duration * 1000:.0f} ms in {slow.description}, blocked at:")
+            lines.append(slow.format_stack().rstrip("\n"))
+        return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # Teacher() as in async_await/code.py, but time.sleep stands in for the blocking input()
+    async def Teacher():
+        time.sleep(0.3)  # blocks the loop: the student cannot do anything meanwhile
+        await asyncio.sleep(0.2)
+        time.sleep(0.15)
+
+    async def Student():
+        for _ in range(10):
+            await asyncio.sleep(0.05)  # well behaved
+
+    async def main():
+        async with LoopMonitor(interval=0.01, threshold=0.1) as monitor:
+            await asyncio.gather(Teacher(), Student())
+        print(monitor.report())
+
+    asyncio.run(main())
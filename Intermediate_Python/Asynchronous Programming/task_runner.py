@@ -0,0 +1,235 @@
+import asyncio
+import contextlib
+import math
+import time
+
+"""
+Run thousands of coroutines with a cap on how many run at the same time.
+
+code.py creates each task by hand and awaits them one after the other. That is
+fine for an idly and a dosa, but with thousands of coroutines:
+
+1. Starting them all at once (asyncio.gather) opens thousands of connections or
+   files together. A semaphore limits the number in flight; a new task is only
+   created when a slot is free, so pending work costs nothing but the coroutine.
+2. One coroutine that hangs would hold up the whole batch, so each task gets a
+   timeout and is cancelled when it runs over.
+3. Results are yielded as soon as each task finishes, not in submission order,
+   so the caller can act on fast results while slow ones are still running.
+4. The run time of every task is recorded, and the report gives the p50, p95
+   and p99 latencies: the average hides the slow tail, the percentiles show it.
+"""
+
+_DONE = object()  # the feeder has created its last task
+
+
+class TaskResult:
+    """The outcome of one coroutine."""
+
+    def __init__(self, index, value=None, error=None, latency=0.0, timed_out=False,
+                 cancelled=False):
+        self.index = index  # position of the coroutine in the input
+        self.value = value
+        self.error = error
+        self.latency = latency  # seconds from the start of the task to its end
+        self.timed_out = timed_out
+        self.cancelled = cancelled
+
+    @property
+    def ok(self):
+        return self.error is None and not self.timed_out and not self.cancelled
+
+    def __repr__(self):
+        if self.ok:
+            state = f"value={self.value!r}"
+        elif self.timed_out:
+            state = "timed out"
+        elif self.cancelled:
+            state = "cancelled"
+        else:
+            state = f"error={self.error!r}"
+        return f"TaskResult(#{self.index}, {state}, {self.latency * 1000:.1f} ms)"
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list, e.g. fraction=0.95."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(fraction * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+class TaskRunner:
+    """Run coroutines with bounded concurrency and per-task timeouts."""
+
+    def __init__(self, limit=100, timeout=None):
+        """
+        Args:
+            limit: Maximum number of coroutines running at the same time
+            timeout: Seconds a single coroutine may run before it is cancelled,
+                None for no limit
+        """
+        self.limit = limit
+        self.timeout = timeout
+        self.latencies = []  # of every task that finished, including failures and timeouts
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.cancelled = 0
+        self.elapsed = 0.0
+        self._running = set()
+        self._feeder = None
+
+    async def _run_one(self, index, coro, results):
+        start = time.perf_counter()
+        try:
+            if self.timeout is None:
+                value = await coro
+            else:
+                value = await asyncio.wait_for(coro, self.timeout)
+            result = TaskResult(index, value=value)
+            self.completed += 1
+        except asyncio.TimeoutError:
+            result = TaskResult(index, timed_out=True)
+            self.timed_out += 1
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            results.put_nowait(TaskResult(index, latency=time.perf_counter() - start,
+                                          cancelled=True))
+            raise
+        except Exception as error:
+            result = TaskResult(index, error=error)
+            self.failed += 1
+        result.latency = time.perf_counter() - start
+        self.latencies.append(result.latency)
+        results.put_nowait(result)
+
+    async def _feed(self, coros, results):
+        """Create a task for each coroutine, but only when a slot is free."""
+        semaphore = asyncio.Semaphore(self.limit)
+        count = 0
+        iterator = iter(coros)
+        try:
+            while True:
+                # Take the slot before the coroutine, so a cancelled feeder holds no coroutine
+                await semaphore.acquire()
+                coro = next(iterator, None)
+                if coro is None:
+                    break
+                task = asyncio.create_task(self._run_one(count, coro, results))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+                task.add_done_callback(lambda _: semaphore.release())
+                count += 1
+        except asyncio.CancelledError:
+            results.put_nowait((_DONE, count, None))
+            raise
+        except Exception as error:  # the iterable itself failed
+            results.put_nowait((_DONE, count, error))
+            return
+        results.put_nowait((_DONE, count, None))
+
+    async def as_completed(self, coros):
+        """
+        Yield a TaskResult for every coroutine, in the order they finish.
+
+        Args:
+            coros: Iterable of coroutines; it is consumed lazily, so it can be
+                a generator producing them on demand
+
+        Leaving the loop early (break, an exception) cancels whatever is still
+        running once the generator is closed; wrap it in contextlib.aclosing()
+        to make that happen straight away.
+        """
+        start = time.perf_counter()
+        results = asyncio.Queue()
+        self._feeder = asyncio.create_task(self._feed(coros, results))
+        received = 0
+        total = None
+        error = None
+        try:
+            while total is None or received < total:
+                item = await results.get()
+                if isinstance(item, tuple) and item[0] is _DONE:
+                    total, error = item[1], item[2]
+                    continue
+                received += 1
+                yield item
+            if error is not None:
+                raise error
+        finally:
+            await self._stop()
+            self.elapsed = time.perf_counter() - start
+
+    async def run(self, coros):
+        """Run all coroutines; returns their TaskResults in input order."""
+        results = []
+        async with contextlib.aclosing(self.as_completed(coros)) as finished:
+            async for result in finished:
+                results.append(result)
+        results.sort(key=lambda result: result.index)
+        return results
+
+    def cancel(self):
+        """Stop starting new coroutines and cancel the ones in flight."""
+        if self._feeder is not None:
+            self._feeder.cancel()
+        for task in list(self._running):
+            task.cancel()
+
+    async def _stop(self):
+        """Cancel the stragglers and wait until they are really gone."""
+        self.cancel()
+        pending = list(self._running)
+        if self._feeder is not None:
+            pending.append(self._feeder)
+        await asyncio.gather(*pending, return_exceptions=True)
+        self._feeder = None
+
+    def percentiles(self):
+        """Dictionary {"p50": seconds, "p95": seconds, "p99": seconds}."""
+        latencies = sorted(self.latencies)
+        return {name: percentile(latencies, fraction)
+                for name, fraction in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99))}
+
+    def report(self):
+        finished = self.completed + self.failed + self.timed_out
+        rate = finished / self.elapsed if self.elapsed else 0.0
+        latency = "  ".join(f"{name} {seconds * 1000:.1f} ms"
+                            for name, seconds in self.percentiles().items())
+        return (f"{finished} tasks in {self.elapsed:.2f}s ({rate:,.0f}/s): {self.completed} ok, "
+                f"{self.failed} failed, {self.timed_out} timed out, {self.cancelled} cancelled\n"
+                f"latency {latency}")
+
+
+if __name__ == "__main__":
+    import random
+
+    async def order(number):
+        # Most orders are idlies, some are dosas, and one in 500 gets forgotten
+        if number % 500 == 499:
+            await asyncio.sleep(60)
+        if number % 97 == 0:
+            raise RuntimeError(f"order {number}: out of batter")
+        await asyncio.sleep(random.uniform(0.02, 0.05) if number % 10 else random.uniform(0.1, 0.2))
+        return number
+
+    async def main():
+        runner = TaskRunner(limit=200, timeout=0.5)
+        first = []
+        async with contextlib.aclosing(runner.as_completed(order(n) for n in range(5000))) as done:
+            async for result in done:
+                if len(first) < 3:
+                    first.append(result)
+        print("first finished:", first)
+        print(runner.report())
+
+        # Leaving early cancels the orders that are still cooking
+        runner = TaskRunner(limit=50)
+        async with contextlib.aclosing(runner.as_completed(order(n) for n in range(1000))) as done:
+            async for result in done:
+                if result.index >= 100:
+                    break
+        print(runner.report())
+
+    asyncio.run(main())
@@ -0,0 +1,253 @@
+import array
+import concurrent.futures
+import csv
+import io
+import os
+
+from csv_columnar import load_columns
+from csv_stream import read_rows
+
+"""
+Parse one large CSV file on several cores.
+
+The file is cut into byte ranges, one per task, and a process pool parses
+the ranges at the same time; the results are put back together in file order.
+
+A cut must fall at the start of a record. A newline is not always one: inside
+a quoted field ("line one\\nline two") it is part of the value. A newline ends
+a record only when an even number of quote characters comes before it,
+because a quote opens a field and the next one closes it (an escaped quote
+"" adds two and keeps the count even). record_boundaries() keeps a running
+count of quotes with bytes.count(), which runs at memory speed, and moves
+every cut forward to the first newline with an even count.
+"""
+
+_BLOCK = 1 << 22  # bytes read at a time while looking for boundaries
+
+
+def record_boundaries(path, parts, start=0, quotechar='"'):
+    """
+    Return the byte offsets [start, b1, b2, ..., size] that split the file
+    into at most parts ranges, each starting at a record boundary.
+
+    Args:
+        path: CSV file
+        parts: Number of ranges wanted
+        start: Offset of the first record (after the header)
+        quotechar: The quote character used in the file
+    """
+    size = os.path.getsize(path)
+    quote = quotechar.encode("ascii")
+    step = max((size - start) // parts, 1)
+    targets = [start + step * i for i in range(1, parts)]
+    boundaries = [start]
+
+    with open(path, "rb") as file:
+        quotes = 0  # quotes seen from start up to the current block
+        offset = start
+        file.seek(start)
+        carry_target = None
+        while targets or carry_target is not None:
+            block = file.read(_BLOCK)
+            if not block:
+                break
+            target = carry_target if carry_target is not None else targets.pop(0)
+            carry_target = None
+            position = 0  # position in block where quote counting stopped
+            block_quotes = quotes
+            while True:
+                local = max(target - offset, position)
+                newline = block.find(b"\n", local)
+                if newline == -1:
+                    carry_target = target  # keep looking in the next block
+                    break
+                block_quotes += block.count(quote, position, newline)
+                position = newline
+                if block_quotes % 2 == 0:
+                    boundary = offset + newline + 1
+                    if boundary > boundaries[-1] and boundary < size:
+                        boundaries.append(boundary)
+                    # Later targets that fall before this boundary are merged into it
+                    while targets and targets[0] < boundary:
+                        targets.pop(0)
+                    if not targets:
+                        break
+                    target = targets.pop(0)
+                else:
+                    position = newline + 1  # the newline is inside a quoted field
+            quotes += block.count(quote)
+            offset += len(block)
+    boundaries.append(size)
+    return boundaries
+
+
+def first_record_end(path, quotechar='"'):
+    """Byte offset just after the first record, e.g. the header."""
+    quote = quotechar.encode("ascii")
+    with open(path, "rb") as file:
+        quotes = 0
+        offset = 0
+        for block in iter(lambda: file.read(_BLOCK), b""):
+            position = 0
+            newline = block.find(b"\n")
+            while newline != -1:
+                quotes += block.count(quote, position, newline)
+                if quotes % 2 == 0:
+                    return offset + newline + 1
+                position = newline
+                newline = block.find(b"\n", newline + 1)
+            quotes += block.count(quote, position)
+            offset += len(block)
+        return offset
+
+
+def _read_range(path, start, end, encoding):
+    with open(path, "rb") as file:
+        file.seek(start)
+        return io.StringIO(file.read(end - start).decode(encoding), newline="")
+
+
+def _parse_rows(path, start, end, types, encoding, csv_options):
+    """Runs in a worker: parse one byte range into a list of rows."""
+    text = _read_range(path, start, end, encoding)
+    return list(read_rows(text, types=types, header=False, **csv_options))
+
+
+def _parse_columns(path, start, end, types, columns, encoding, csv_options):
+    """Runs in a worker: parse one byte range into typed columns."""
+    text = _read_range(path, start, end, encoding)
+    return load_columns(text, types, columns=columns, header=False, **csv_options)
+
+
+class ParallelCSV:
+    """A CSV file parsed by a process pool, chunk by chunk."""
+
+    def __init__(self, path, workers=None, chunks=None, header=True, encoding="utf-8",
+                 **csv_options):
+        """
+        Work out the header and the byte ranges of the chunks.
+
+        Args:
+            path: CSV file
+            workers: Number of worker processes, os.cpu_count() by default
+            chunks: Number of byte ranges, 4 per worker by default so that a
+                slow chunk does not leave the other workers idle
+            header: The first record holds the column names
+            encoding: Encoding of the file
+            csv_options: Passed on to csv.reader (delimiter, quotechar, ...)
+        """
+        self.path = path
+        self.workers = workers or os.cpu_count() or 1
+        self.encoding = encoding
+        self.csv_options = csv_options
+        self.names = None
+        quotechar = csv_options.get("quotechar", '"')
+        start = 0
+        if header:
+            with open(path, "r", encoding=encoding, newline="") as file:
+                self.names = next(csv.reader(file, **csv_options), None)
+            start = first_record_end(path, quotechar)
+        self.boundaries = record_boundaries(path, chunks or self.workers * 4, start, quotechar)
+
+    def _by_index(self, columns):
+        """Turn column names into indexes, the chunks have no header."""
+        if self.names is None:
+            return dict(columns) if isinstance(columns, dict) else columns
+        if isinstance(columns, dict):
+            return {self.names.index(name) if not isinstance(name, int) else name: value
+                    for name, value in columns.items()}
+        return [self.names.index(name) if not isinstance(name, int) else name for name in columns]
+
+    def _ranges(self):
+        return list(zip(self.boundaries, self.boundaries[1:]))
+
+    def iter_rows(self, types=None):
+        """
+        Yield every row in file order while the pool parses ahead.
+
+        Args:
+            types: Dictionary column -> converter (module level functions
+                such as int or float, so they can be sent to the workers)
+        """
+        types = self._by_index(types or {})
+        with concurrent.futures.ProcessPoolExecutor(self.workers) as pool:
+            futures = [pool.submit(_parse_rows, self.path, start, end, types, self.encoding,
+                                   self.csv_options) for start, end in self._ranges()]
+            for future in futures:  # in submission order, which is file order
+                yield from future.result()
+
+    def rows(self, types=None):
+        """Return all rows as a list, in file order."""
+        return list(self.iter_rows(types))
+
+    def columns(self, types=None, columns=None):
+        """
+        Return a dictionary column -> typed column (see csv_columnar.load_columns).
+
+        Args:
+            types: Dictionary column -> int, float, bool, str or an array typecode
+            columns: The columns to load, all of them by default
+        """
+        if columns is None:
+            if self.names is None:
+                raise ValueError("columns are required when the file has no header")
+            columns = self.names
+        indexes = self._by_index(columns)
+        types = self._by_index(types or {})
+        result = {}
+        with concurrent.futures.ProcessPoolExecutor(self.workers) as pool:
+            futures = [pool.submit(_parse_columns, self.path, start, end, types, indexes,
+                                   self.encoding, self.csv_options)
+                       for start, end in self._ranges()]
+            for future in futures:
+                part = future.result()
+                for name, index in zip(columns, indexes):
+                    if name not in result:
+                        result[name] = part[index]
+                    else:
+                        result[name].extend(part[index])
+        return result
+
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+
+    from csv_stream import write_rows
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "orders.csv")
+    rows = 400_000
+
+    # Every tenth comment holds a quoted newline, so naive splitting would break records
+    write_rows(path, ([i, f"customer {i % 1000}", i * 0.5,
+                       "line one\nline two" if i % 10 == 0 else "ok"] for i in range(rows)),
+               header=["id", "customer", "amount", "comment"])
+    types = {"id": int, "amount": float}
+
+    expected = list(read_rows(path, types=types))
+    single = ParallelCSV(path, workers=1)
+    assert single.rows(types) == expected
+    print(f"{rows} rows, {os.path.getsize(path) / 1_000_000:.1f} MB, "
+          f"{len(single.boundaries) - 1} chunks")
+
+    start = time.perf_counter()
+    list(read_rows(path, types=types))
+    baseline = time.perf_counter() - start
+    print(f"{'read_rows (1 core)':<22} {baseline:.2f}s")
+
+    for workers in sorted({1, 2, os.cpu_count() or 1}):
+        parser = ParallelCSV(path, workers=workers)
+        start = time.perf_counter()
+        parsed = parser.rows(types)
+        elapsed = time.perf_counter() - start
+        assert len(parsed) == rows
+        print(f"{f'{workers} worker(s), rows':<22} {elapsed:.2f}s  {baseline / elapsed:.2f}x")
+        start = time.perf_counter()
+        columns = parser.columns(types, columns=["id", "amount"])
+        elapsed = time.perf_counter() - start
+        assert isinstance(columns["amount"], array.array) and len(columns["amount"]) == rows
+        print(f"{f'{workers} worker(s), columns':<22} {elapsed:.2f}s  {baseline / elapsed:.2f}x")
+
+    os.remove(path)
+    os.rmdir(directory)
@@ -0,0 +1,250 @@
+import csv
+import io
+import os
+import time
+import tracemalloc
+
+"""
+Streaming CSV reading and buffered CSV writing.
+
+read_rows() is a generator: it hands out one row at a time while the csv
+module reads the file in the background, so memory stays the same whether
+the file has a thousand rows or a billion. Compare that with
+file.readlines(), which loads every line of the file into a list first.
+
+Columns can be converted to Python types on the way out (int, float, dates,
+...) with a dictionary of converters.
+
+CSVWriter collects rows in an in-memory buffer and writes them to the file
+in large blocks, instead of one small write() per row.
+"""
+
+
+def parse_bool(value):
+    """Convert "true"/"false", "yes"/"no", "1"/"0" (any case) to a bool."""
+    lowered = value.strip().lower()
+    if lowered in ("true", "yes", "y", "1"):
+        return True
+    if lowered in ("false", "no", "n", "0"):
+        return False
+    raise ValueError(f"not a boolean: {value!r}")
+
+
+def optional(converter):
+    """Wrap a converter so that empty fields become None instead of an error."""
+    def convert(value):
+        return converter(value) if value != "" else None
+    return convert
+
+
+class ConversionError(ValueError):
+    """A field could not be converted to the type of its column."""
+
+    def __init__(self, line, column, value, error):
+        super().__init__(f"line {line}, column {column!r}: cannot convert {value!r} ({error})")
+        self.line = line
+        self.column = column
+        self.value = value
+
+
+def open_text(source, encoding):
+    """Return (file object, should_close) for a path or an already open file."""
+    if isinstance(source, (str, bytes, os.PathLike)):
+        return open(source, "r", encoding=encoding, newline=""), True
+    return source, False
+
+
+def read_rows(source, types=None, header=True, as_dict=False, errors="raise",
+              encoding="utf-8", **csv_options):
+    """
+    Lazily yield the rows of a CSV file.
+
+    Args:
+        source: Path of the file, or a text file object opened with newline=""
+        types: Dictionary column -> converter, e.g. {"age": int, "price": float};
+            columns are header names, or indexes when there is no header
+        header: The first row holds the column names (it is not yielded)
+        as_dict: Yield dictionaries keyed by column name instead of lists
+        errors: What to do with a field that does not convert: "raise" a
+            ConversionError, "skip" the row, or "none" to store None
+        encoding: Encoding used when the file is opened from a path
+        csv_options: Passed on to csv.reader (delimiter, quotechar, ...)
+    """
+    if errors not in ("raise", "skip", "none"):
+        raise ValueError("errors must be 'raise', 'skip' or 'none'")
+    file, should_close = open_text(source, encoding)
+    try:
+        reader = csv.reader(file, **csv_options)
+        names = next(reader, None) if header else None
+        if header and names is None:
+            return  # empty file
+
+        # Turn column names into indexes once, instead of once per row
+        converters = []
+        for column, converter in (types or {}).items():
+            if isinstance(column, int):
+                index = column
+            elif names is not None and column in names:
+                index = names.index(column)
+            else:
+                raise KeyError(f"unknown column {column!r}")
+            converters.append((index, column, converter))
+
+        for row in reader:
+            if converters:
+                row = _convert(row, converters, errors, reader.line_num)
+                if row is None:
+                    continue
+            if as_dict:
+                yield dict(zip(names if names else range(len(row)), row))
+            else:
+                yield row
+    finally:
+        if should_close:
+            file.close()
+
+
+def _convert(row, converters, errors, line):
+    """Convert the typed fields of one row; None means the row is skipped."""
+    for index, column, converter in converters:
+        if index >= len(row):
+            continue  # short row, nothing to convert
+        try:
+            row[index] = converter(row[index])
+        except (ValueError, TypeError) as error:
+            if errors == "raise":
+                raise ConversionError(line, column, row[index], error) from None
+            if errors == "skip":
+                return None
+            row[index] = None
+    return row
+
+
+class CSVWriter:
+    """Write CSV rows through a large in-memory buffer."""
+
+    def __init__(self, target, header=None, buffer_size=1 << 20, encoding="utf-8",
+                 mode="w", **csv_options):
+        """
+        Open the file for writing.
+
+        Args:
+            target: Path of the file, or a text file object opened with newline=""
+            header: Column names written as the first row, if given
+            buffer_size: Characters collected before they are written out
+            encoding: Encoding used when the file is opened from a path
+            mode: "w" to overwrite, "a" to append
+            csv_options: Passed on to csv.writer (delimiter, quoting, ...)
+        """
+        if isinstance(target, (str, bytes, os.PathLike)):
+            self._file = open(target, mode, encoding=encoding, newline="")
+            self._should_close = True
+        else:
+            self._file = target
+            self._should_close = False
+        self.buffer_size = buffer_size
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, **csv_options)
+        self.rows_written = 0
+        self.flushes = 0
+        if header is not None:
+            self.writerow(header)
+
+    def writerow(self, row):
+        self._writer.writerow(row)
+        self.rows_written += 1
+        if self._buffer.tell() >= self.buffer_size:
+            self.flush()
+
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
+
+    def flush(self):
+        """Write the buffered rows to the file in one call."""
+        data = self._buffer.getvalue()
+        if data:
+            self._file.write(data)
+            self.flushes += 1
+        self._buffer.seek(0)
+        self._buffer.truncate()
+
+    def close(self):
+        self.flush()
+        if self._should_close:
+            self._file.close()
+        else:
+            self._file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def write_rows(target, rows, header=None, **options):
+    """Write all rows to target with a CSVWriter and return the row count."""
+    with CSVWriter(target, header, **options) as writer:
+        writer.writerows(rows)
+        return writer.rows_written
+
+
+def time_and_memory(work):
+    """
+    Run work() twice: once timed, once under tracemalloc, which slows down
+    every allocation and would distort the timing. Used by the demos of this
+    folder to compare loaders.
+
+    Returns (result, seconds, held, peak): held is the memory still taken by
+    what work() returned, peak the most it had allocated at one time, both
+    in bytes.
+    """
+    start = time.perf_counter()
+    work()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    try:
+        result = work()
+        held, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, elapsed, held, peak
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "people.csv")
+    rows = 500_000
+
+    def generated_rows():
+        for i in range(rows):
+            yield [i, f"Chandra {i}", 20 + i % 50, f"{i * 1.5:.2f}", "yes" if i % 2 else "no"]
+
+    start = time.perf_counter()
+    write_rows(path, generated_rows(), header=["id", "name", "age", "balance", "active"])
+    print(f"CSVWriter: {rows} rows in {time.perf_counter() - start:.2f}s, "
+          f"{os.path.getsize(path) / 1_000_000:.1f} MB")
+
+    types = {"id": int, "age": int, "balance": float, "active": parse_bool}
+    print(next(read_rows(path, types=types, as_dict=True)))
+
+    def measure(label, work):
+        total, elapsed, _, peak = time_and_memory(work)
+        print(f"{label:<12} total age {total}, {elapsed:.2f}s, peak memory {peak / 1_000_000:.1f} MB")
+
+    def with_readlines():
+        with open(path, newline="") as file:
+            lines = file.readlines()
+        rows = csv.reader(lines[1:])
+        return sum(int(row[2]) for row in rows)
+
+    def with_read_rows():
+        return sum(row[2] for row in read_rows(path, types={"age": int}))
+
+    measure("readlines()", with_readlines)
+    measure("read_rows()", with_read_rows)
+    os.remove(path)
+    os.rmdir(directory)
@@ -0,0 +1,173 @@
+# File: chunk_reader.py
+# Description: Reads a binary file through one reusable buffer, without copying.
+
+import os
+
+# --- Why ---
+# code.py reads with file.read(), which creates a new string holding everything that
+# is left in the file. For a large file that is a large allocation, and looping with
+# file.read(size) still allocates a new bytes object for every chunk.
+#
+# ChunkReader allocates one bytearray up front and fills it again and again with
+# readinto(). Consumers get memoryview slices of that buffer: a memoryview is a window
+# onto existing memory, so slicing it copies nothing.
+#
+# The catch: a slice is only valid until the reader moves on, because the next
+# readinto() overwrites the buffer. Call bytes(view) to keep a piece.
+#
+# chunks() runs at the speed of the disk. lines() splits the buffer with a Python
+# loop, so it is slower than "for line in file" (which splits in C); its advantage is
+# that it allocates nothing per line, which matters when the lines are handed to code
+# that accepts memoryviews (hashing, socket.send, struct.unpack_from, ...).
+
+
+class ChunkReader:
+    """Iterate over a binary file in chunks or lines, reusing a single buffer."""
+
+    def __init__(self, source, chunk_size=1 << 20):
+        """
+        Open the file and allocate the buffer.
+
+        Args:
+            source: Path of the file, or a binary file object with readinto()
+            chunk_size: Size of the reusable buffer in bytes
+        """
+        if isinstance(source, (str, bytes, os.PathLike)):
+            # Unbuffered, so readinto() goes straight into our buffer with no extra copy
+            self._file = open(source, "rb", buffering=0)
+            self._should_close = True
+        else:
+            self._file = source
+            self._should_close = False
+        self._buffer = bytearray(chunk_size)
+        self._view = memoryview(self._buffer)
+        self.bytes_read = 0
+        self.reads = 0
+
+    def chunks(self):
+        """Yield a memoryview of each chunk read; valid until the next one."""
+        while True:
+            count = self._read_into(self._view)
+            if not count:
+                return
+            yield self._view[:count]
+
+    __iter__ = chunks
+
+    def lines(self, keepends=True):
+        """
+        Yield a memoryview of each line; valid until the next one.
+
+        Args:
+            keepends: Keep the b"\\n" at the end of each line
+        """
+        buffer, view = self._buffer, self._view
+        filled = 0  # bytes of buffer holding data
+        while True:
+            count = self._read_into(view[filled:])
+            filled += count
+            start = 0
+            find = buffer.find
+            end_offset = 1 if keepends else 0
+            newline = find(b"\n", 0, filled)
+            while newline != -1:
+                yield view[start:newline + end_offset]
+                start = newline + 1
+                newline = find(b"\n", start, filled)
+
+            if not count:  # end of file
+                if start < filled:
+                    yield view[start:filled]  # last line without a newline
+                return
+
+            # Move the unfinished line to the front; memoryview assignment handles the overlap
+            rest = filled - start
+            view[:rest] = view[start:filled]
+            filled = rest
+            if filled == len(buffer):
+                # A single line longer than the buffer: grow it (the only reallocation)
+                buffer, view = self._grow()
+
+    def _read_into(self, target):
+        count = self._file.readinto(target) or 0
+        self.bytes_read += count
+        self.reads += 1
+        return count
+
+    def _grow(self):
+        bigger = bytearray(len(self._buffer) * 2)
+        bigger[:len(self._buffer)] = self._buffer
+        self._view.release()
+        self._buffer = bigger
+        self._view = memoryview(bigger)
+        return self._buffer, self._view
+
+    def close(self):
+        self._view.release()
+        if self._should_close:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+    import tracemalloc
+
+    with tempfile.NamedTemporaryFile("wb", suffix=".txt", delete=False) as file:
+        for i in range(1_000_000):
+            file.write(b"#Appending the code print('Hello World') %d\n" % i)
+        file_path = file.name
+    size_mb = os.path.getsize(file_path) / 1_000_000
+
+    def read_all():
+        with open(file_path, "rb") as file:
+            return file.read().count(b"\n")
+
+    def read_chunks():
+        newlines = 0
+        with open(file_path, "rb") as file:
+            while chunk := file.read(1 << 20):  # a new bytes object every time
+                newlines += chunk.count(b"\n")
+        return newlines
+
+    def chunk_reader():
+        newlines = 0
+        with ChunkReader(file_path) as reader:
+            for chunk in reader:
+                newlines += chunk.obj.count(b"\n", 0, len(chunk))  # search the buffer in place
+        return newlines
+
+    def for_line_in_file():
+        with open(file_path, "rb") as file:
+            return sum(1 for line in file if line[-2] == 55)  # ord("7")
+
+    def chunk_reader_lines():
+        with ChunkReader(file_path) as reader:
+            return sum(1 for line in reader.lines() if line[-2] == 55)  # ord("7")
+
+    readers = [("file.read()", read_all), ("file.read(1 MiB) loop", read_chunks),
+               ("ChunkReader chunks", chunk_reader), ("for line in file", for_line_in_file),
+               ("ChunkReader lines", chunk_reader_lines)]
+    speeds = {}
+    for label, work in readers:
+        start = time.perf_counter()
+        work()
+        speeds[label] = size_mb / (time.perf_counter() - start)
+    # The line readers allocate once per line, so tracing them is far slower
+    # than running them: allocations are counted in a pass of their own
+    tracemalloc.start()
+    for label, work in readers:
+        tracemalloc.reset_peak()
+        result = work()
+        peak = tracemalloc.get_traced_memory()[1]
+        print(f"{label:<22} {result:>8} {speeds[label]:>8.0f} MB/s  "
+              f"peak allocations {peak / 1_000_000:.1f} MB")
+    tracemalloc.stop()
+
+    os.remove(file_path)
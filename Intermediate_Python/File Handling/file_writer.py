@@ -0,0 +1,254 @@
+# File: file_writer.py
+# Description: A file writer that batches small writes, can replace files atomically
+# and can batch fsync calls.
+
+import os
+import stat
+import tempfile
+import time
+
+# --- Why ---
+# code.py opens the same file three times ("w", "a", "r+") and does a few small
+# writes each time. Every open() is a system call, every write() may be one, and
+# while a file is being rewritten in place a reader can see it half written.
+#
+# BatchWriter:
+# 1. Collects writes in memory and hands them to the file in large blocks.
+# 2. In atomic mode it writes to a temporary file in the same directory and renames
+#    it over the target on close(). os.replace() is atomic, so readers see either the
+#    old file or the complete new one, never something in between.
+# 3. fsync (forcing the data onto the disk) is slow, so it can be done once per
+#    fsync_bytes written instead of after every write.
+
+
+class BatchWriter:
+    """Buffered file writer with optional atomic replacement and batched fsync."""
+
+    def __init__(self, path, mode="w", buffer_size=1 << 20, atomic=False, fsync_bytes=None,
+                 encoding="utf-8"):
+        """
+        Open the file (or its temporary replacement).
+
+        Args:
+            path: File to write
+            mode: "w" to overwrite, "a" to append; add "b" for bytes ("wb", "ab")
+            buffer_size: Characters (or bytes) collected before they are written out
+            atomic: Write to a temporary file and rename it over path on close()
+            fsync_bytes: fsync after this many bytes were written; None syncs only
+                on close() in atomic mode and never otherwise, 0 syncs every flush
+            encoding: Encoding for text modes
+        """
+        if mode.replace("b", "") not in ("w", "a"):
+            raise ValueError("mode must be 'w', 'a', 'wb' or 'ab'")
+        self.path = path
+        self.binary = "b" in mode
+        self.buffer_size = buffer_size
+        self.atomic = atomic
+        self.fsync_bytes = fsync_bytes
+        self._buffer = []
+        self._buffered = 0
+        self._unsynced = 0
+        self.writes = 0
+        self.flushes = 0
+        self.fsyncs = 0
+        self.closed = False
+        self._encoding = encoding
+
+        file_mode = "ab" if mode.startswith("a") else "wb"
+        self._temp_path = None
+        if atomic:
+            directory = os.path.dirname(os.path.abspath(path))
+            # Same directory, so the final rename never crosses file systems
+            handle, self._temp_path = _create_temp(directory, os.path.basename(path))
+            self._file = os.fdopen(handle, "wb")
+            try:
+                # os.replace() keeps the temporary file's mode, not the old file's
+                os.chmod(self._temp_path, stat.S_IMODE(os.stat(path).st_mode))
+            except FileNotFoundError:
+                pass  # a new file: created with the umask applied, like open() does
+            if mode.startswith("a") and os.path.exists(path):
+                with open(path, "rb") as original:  # appending keeps the old content
+                    while chunk := original.read(1 << 20):
+                        self._file.write(chunk)
+        else:
+            self._file = open(path, file_mode)
+
+    def write(self, data):
+        """Queue data for writing; returns the number of characters (or bytes)."""
+        if self.closed:
+            raise ValueError("write to a closed BatchWriter")
+        if isinstance(data, bytes) != self.binary:
+            raise TypeError("bytes are written in binary mode, str in text mode")
+        self._buffer.append(data)
+        self._buffered += len(data)
+        self.writes += 1
+        if self._buffered >= self.buffer_size:
+            self.flush()
+        return len(data)
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def flush(self):
+        """Write the buffered data with a single write() call."""
+        if not self._buffer:
+            return
+        if self.binary:
+            data = b"".join(self._buffer)
+        else:
+            data = "".join(self._buffer).encode(self._encoding)
+        self._file.write(data)
+        self._file.flush()
+        self._buffer.clear()
+        self._buffered = 0
+        self.flushes += 1
+        self._unsynced += len(data)
+        if self.fsync_bytes is not None and self._unsynced >= self.fsync_bytes:
+            self.sync()
+
+    def sync(self):
+        """Force everything written so far onto the disk."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self.fsyncs += 1
+
+    def close(self):
+        """Flush, and in atomic mode move the finished file into place."""
+        if self.closed:
+            return
+        self.flush()
+        if self.atomic or (self.fsync_bytes is not None and self._unsynced):
+            self.sync()  # the data must be on disk before the rename makes it visible
+        self._file.close()
+        self.closed = True
+        if self.atomic:
+            os.replace(self._temp_path, self.path)
+            _sync_directory(self.path)
+
+    def abort(self):
+        """Stop without touching the target file (atomic mode) and drop the buffer."""
+        self._buffer.clear()
+        self._file.close()
+        self.closed = True
+        if self.atomic and os.path.exists(self._temp_path):
+            os.remove(self._temp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None and self.atomic:
+            self.abort()  # an error half way must not replace the original file
+        else:
+            self.close()
+
+
+def _create_temp(directory, suffix):
+    """
+    Create an empty temporary file in directory; returns (fd, path).
+
+    Unlike tempfile.mkstemp(), which always uses mode 0600, the file is
+    created with mode 0666 and the kernel applies the umask, as for open().
+    """
+    flags = os.O_CREAT | os.O_EXCL | os.O_WRONLY | getattr(os, "O_BINARY", 0)
+    while True:
+        temp_path = os.path.join(directory, f".tmp-{os.urandom(6).hex()}{suffix}")
+        try:
+            return os.open(temp_path, flags, 0o666), temp_path
+        except FileExistsError:
+            continue
+
+
+def _sync_directory(path):
+    """fsync the directory so the rename itself survives a crash (POSIX only)."""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    descriptor = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+def atomic_write(path, data, encoding="utf-8"):
+    """Replace path with data (str or bytes) so readers never see a partial file."""
+    mode = "wb" if isinstance(data, bytes) else "w"
+    with BatchWriter(path, mode, atomic=True, encoding=encoding) as writer:
+        writer.write(data)
+
+
+if __name__ == "__main__":
+    directory = tempfile.mkdtemp()
+    file_path = os.path.join(directory, "test_code.py")  # a temp dir instead of an absolute c:\ path
+
+    # The three steps of code.py, each as one atomic replacement
+    atomic_write(file_path, "#this was created by w mode\n")
+    with BatchWriter(file_path, "a", atomic=True) as file:
+        file.write("#Appending the code\n")
+        file.write("print('Hello World')\n")
+    with open(file_path) as file:
+        print(file.read())
+
+    # A failure half way leaves the original file untouched
+    try:
+        with BatchWriter(file_path, "w", atomic=True) as file:
+            file.write("#half written")
+            raise RuntimeError("crash while writing")
+    except RuntimeError:
+        pass
+    with open(file_path) as file:
+        print("after failed rewrite:", file.readline().strip())
+
+    # --- Benchmark: writes/sec ---
+    lines = 100_000
+    line = "print('Hello World')\n"
+
+    def open_per_write():
+        for _ in range(lines):
+            with open(file_path, "a") as file:
+                file.write(line)
+
+    def batch_writer():
+        with BatchWriter(file_path, "w") as file:
+            for _ in range(lines):
+                file.write(line)
+
+    def batch_writer_atomic():
+        with BatchWriter(file_path, "w", atomic=True) as file:
+            for _ in range(lines):
+                file.write(line)
+
+    for label, work in [("open() per write", open_per_write), ("BatchWriter", batch_writer),
+                        ("BatchWriter, atomic", batch_writer_atomic)]:
+        os.remove(file_path)
+        start = time.perf_counter()
+        work()
+        elapsed = time.perf_counter() - start
+        print(f"{label:<30} {lines / elapsed:>12,.0f} writes/sec")
+
+    # fsync after every write against one fsync per 64 KiB
+    synced_lines = 500
+
+    def fsync_every_write():
+        with open(file_path, "w") as file:
+            for _ in range(synced_lines):
+                file.write(line)
+                file.flush()
+                os.fsync(file.fileno())
+
+    def fsync_batched():
+        with BatchWriter(file_path, "w", buffer_size=4096, fsync_bytes=1 << 16) as file:
+            for _ in range(synced_lines):
+                file.write(line)
+
+    for label, work in [("fsync per write", fsync_every_write),
+                        ("BatchWriter, fsync per 64 KiB", fsync_batched)]:
+        start = time.perf_counter()
+        work()
+        elapsed = time.perf_counter() - start
+        print(f"{label:<30} {synced_lines / elapsed:>12,.0f} writes/sec")
+
+    os.remove(file_path)
+    os.rmdir(directory)
@@ -0,0 +1,238 @@
+import concurrent.futures
+import functools
+import itertools
+import operator
+import os
+
+"""
+Lazy map/filter/reduce pipelines.
+
+square(), filtering() and reducing() in code.py each build a complete list
+with list(map(...)) or list(filter(...)) before the next step starts, so for
+ten million numbers the squares and then the even squares all sit in memory
+at the same time.
+
+A Pipeline only records its steps:
+
+    Pipeline(range(10_000_000)).map(square).filter(is_even).reduce(operator.add)
+
+Nothing runs until a terminal method (reduce, sum, to_list, first, iterating)
+asks for results. The steps are then chained with the built-in map() and
+filter() and itertools, which run in C and pass one item at a time from step
+to step: a single pass over the source, with no list in between. take(n) and
+first() stop pulling from the source once they have enough, so even an endless
+source works.
+
+parallel() runs the map and filter steps on a process pool, a chunk of items
+per task, and combines the chunks in order. It pays off when the functions do
+real work per item; for a cheap step such as squaring a number, sending the
+items to another process costs more than the work. The functions must be
+defined at module level so they can be pickled, and a reduce function must be
+associative ((a + b) + c == a + (b + c)) because every chunk is reduced on its own.
+"""
+
+
+def _apply(stages, iterable):
+    """Chain the stages over iterable lazily; one pass, no intermediate lists."""
+    for kind, func in stages:
+        if kind == "map":
+            iterable = map(func, iterable)
+        elif kind == "filter":
+            iterable = filter(func, iterable)
+        elif kind == "take":
+            iterable = itertools.islice(iterable, func)
+        elif kind == "take_while":
+            iterable = itertools.takewhile(func, iterable)
+    return iterable
+
+
+def _run_chunk(stages, chunk):
+    """Runs in a worker: the map/filter stages over one chunk."""
+    return list(_apply(stages, chunk))
+
+
+def _reduce_chunk(stages, func, chunk):
+    """Runs in a worker: the stages and then the reduction of one chunk."""
+    items = _apply(stages, chunk)
+    for first in items:
+        return True, functools.reduce(func, items, first)
+    return False, None  # every item was filtered out
+
+
+class Pipeline:
+    """A lazy chain of map/filter/take steps over an iterable."""
+
+    def __init__(self, source, stages=(), workers=None, chunk_size=None):
+        """
+        Args:
+            source: Any iterable, consumed only when results are asked for
+            stages: Steps recorded so far, as (kind, function) pairs
+            workers: Number of processes for the map/filter steps, None to run
+                them in this process (see parallel())
+            chunk_size: Items per task for the parallel backend
+        """
+        self.source = source
+        self.stages = tuple(stages)
+        self.workers = workers
+        self.chunk_size = chunk_size
+
+    def _with(self, kind, func):
+        # A new Pipeline each time: steps never change a pipeline that already exists
+        return Pipeline(self.source, self.stages + ((kind, func),), self.workers, self.chunk_size)
+
+    def map(self, func):
+        return self._with("map", func)
+
+    def filter(self, predicate):
+        return self._with("filter", predicate)
+
+    def take(self, count):
+        """Keep only the first count items; the source is not read further."""
+        return self._with("take", count)
+
+    def take_while(self, predicate):
+        """Keep items until predicate is false for the first time."""
+        return self._with("take_while", predicate)
+
+    def parallel(self, workers=None, chunk_size=10_000):
+        """
+        Run the map and filter steps on a process pool.
+
+        Args:
+            workers: Number of processes, os.cpu_count() by default
+            chunk_size: Items sent to a worker at a time
+        """
+        return Pipeline(self.source, self.stages, workers or os.cpu_count() or 1, chunk_size)
+
+    def _split(self):
+        """The leading map/filter stages (parallel) and the rest (sequential)."""
+        for index, (kind, _) in enumerate(self.stages):
+            if kind not in ("map", "filter"):
+                return self.stages[:index], self.stages[index:]
+        return self.stages, ()
+
+    def _chunks(self):
+        source = iter(self.source)
+        while True:
+            chunk = list(itertools.islice(source, self.chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+    def _parallel_results(self, worker, *args):
+        """Yield worker(*args, chunk) for every chunk, in order, a few chunks ahead."""
+        in_flight = self.workers * 2  # bounded, so a huge source is never read at once
+        with concurrent.futures.ProcessPoolExecutor(self.workers) as executor:
+            pending = []
+            try:
+                for chunk in self._chunks():
+                    pending.append(executor.submit(worker, *args, chunk))
+                    if len(pending) >= in_flight:
+                        yield pending.pop(0).result()
+                while pending:
+                    yield pending.pop(0).result()
+            finally:
+                for future in pending:
+                    future.cancel()  # stopped early, e.g. by take()
+
+    def __iter__(self):
+        if self.workers is None:
+            return iter(_apply(self.stages, self.source))
+        parallel, sequential = self._split()
+        results = itertools.chain.from_iterable(self._parallel_results(_run_chunk, parallel))
+        return iter(_apply(sequential, results))
+
+    def reduce(self, func, initial=None):
+        """
+        Combine all items with func, like functools.reduce.
+
+        Args:
+            func: Function of two arguments
+            initial: Starting value; without it the first item is used
+        """
+        parallel, sequential = self._split()
+        if self.workers is None or sequential:
+            items = iter(self)
+        else:
+            # Each worker reduces its own chunk; only the partial results come back
+            items = (value for found, value in self._parallel_results(_reduce_chunk, parallel, func)
+                     if found)
+        if initial is None:
+            return functools.reduce(func, items)
+        return functools.reduce(func, items, initial)
+
+    def sum(self):
+        return self.reduce(operator.add, 0)
+
+    def count(self):
+        return self.map(_one).reduce(operator.add, 0)
+
+    def to_list(self):
+        return list(self)
+
+    def first(self, default=None):
+        """The first item, reading only as much of the source as needed."""
+        return next(iter(self.take(1)), default)
+
+
+def _one(_):
+    return 1
+
+
+def square(x):
+    return x ** 2
+
+
+def is_even(x):
+    return x % 2 == 0
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+    import tracemalloc
+
+    # square() -> filtering() -> reducing() from code.py, as one lazy pass
+    numbers = [1, 2, 3]
+    print(Pipeline(numbers).map(square).filter(is_even).to_list())  # [4]
+    print(Pipeline(numbers).reduce(operator.mul))  # 6
+    print(Pipeline(itertools.count(1)).map(square).filter(is_even).take(5).to_list())
+
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 10 ** 7
+
+    def with_lists():
+        squared_numbers = list(map(lambda x: x ** 2, range(size)))
+        even_squares = list(filter(lambda y: y % 2 == 0, squared_numbers))
+        return functools.reduce(lambda x, y: x + y, even_squares)
+
+    def lazy():
+        return Pipeline(range(size)).map(square).filter(is_even).sum()
+
+    def lazy_parallel():
+        return Pipeline(range(size)).map(square).filter(is_even).parallel(chunk_size=100_000).sum()
+
+    def early_exit():
+        # Stops after the first square above 10**6, the rest of the source is never read
+        return Pipeline(range(size)).map(square).filter(lambda x: x > 10 ** 6).first()
+
+    expected = with_lists()
+    print(f"{size:,} numbers, {os.cpu_count()} CPU(s)")
+    for label, work in [("lists, as in code.py", with_lists), ("Pipeline", lazy),
+                        ("Pipeline.parallel()", lazy_parallel), ("Pipeline.first()", early_exit)]:
+        start = time.perf_counter()
+        result = work()
+        elapsed = time.perf_counter() - start
+        if work is not early_exit:
+            assert result == expected
+        print(f"{label:<22} {elapsed:>7.2f}s")
+
+    # What the lazy chain saves is the intermediate lists. tracemalloc only sees
+    # this process (not parallel()'s workers) and makes every allocation slow,
+    # so only the two single-process versions are traced, after the timings.
+    peaks = []
+    for work in (with_lists, lazy):
+        tracemalloc.start()
+        work()
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    print(f"peak memory: lists {peaks[0] / 1_000_000:.1f} MB, Pipeline {peaks[1] / 1_000_000:.1f} MB")
@@ -0,0 +1,124 @@
+import array
+import functools
+import math
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, array.array is handled without it
+    np = None
+
+"""
+Faster square(), filtering() and reducing() for arrays of numbers.
+
+The versions in code.py call a Python lambda for every element. Calling a
+Python function is the expensive part; the arithmetic itself is cheap. For
+numeric data the same steps can run without any Python code per element:
+
+- NumPy arrays: the whole operation is one vectorized call (x * x,
+  x[x % 2 == 0], x.prod()) that loops in C over the raw numbers.
+- array.array without NumPy: reducing() uses math.prod(), which multiplies
+  in C without calling Python code per element and is several times faster.
+  The standard library has no arithmetic on whole arrays, so squaring and
+  filtering would still turn every element into a Python number and pack
+  the results back into an array. Measured, that was no faster than the
+  lambdas (squaring was about 20% slower), so square() and filtering() take
+  the pure-Python path for arrays and return lists.
+- Anything else (lists, generators, ...) takes the original pure-Python path.
+
+Integers never overflow silently: NumPy's int64 would wrap around, so squares
+that do not fit fall back to Python integers, and integer products are always
+computed with Python integers. Like functools.reduce(), reducing() raises
+TypeError for an empty input instead of returning 1.
+"""
+
+
+def _is_numpy(values):
+    return np is not None and isinstance(values, np.ndarray) and values.dtype != object
+
+
+def square(x):
+    """Square every element."""
+    if _is_numpy(x):
+        if x.dtype.kind in "iu" and x.size:
+            largest = max(abs(int(x.max())), abs(int(x.min())))
+            if largest * largest > np.iinfo(x.dtype).max:
+                return np.array([value * value for value in x.tolist()], dtype=object)
+        return x * x
+    return list(map(lambda x: x**2, x))  # the pure-Python path from code.py
+
+
+def filtering(y):
+    """Keep the even elements."""
+    if _is_numpy(y):
+        return y[y % 2 == 0]
+    return list(filter(lambda y: y % 2 == 0, y))
+
+
+def reducing(numbers):
+    """Multiply all elements together."""
+    if (_is_numpy(numbers) or isinstance(numbers, array.array)) and not len(numbers):
+        # math.prod() and ndarray.prod() give 1 here, functools.reduce() raises
+        raise TypeError("reduce() of empty iterable with no initial value")
+    if _is_numpy(numbers):
+        if numbers.dtype.kind in "iu":
+            return math.prod(numbers.tolist())  # Python integers: exact, no wrap-around
+        return numbers.prod()
+    if isinstance(numbers, array.array):
+        return math.prod(numbers)
+    return functools.reduce(lambda x, y: x * y, numbers)
+
+
+if __name__ == "__main__":
+    import time
+
+    # The calls from code.py, with arrays
+    numbers = array.array("i", [1, 2, 3])
+    squared_numbers = square(numbers)
+    print(squared_numbers, filtering(squared_numbers), reducing(numbers))
+
+    # code.py's lambdas against the backends that exist for each function.
+    # square() and filtering() have no array.array backend (they run the
+    # lambdas), so that cell is not timed.
+    lambdas = {
+        "square": lambda x: list(map(lambda x: x**2, x)),
+        "filtering": lambda y: list(filter(lambda y: y % 2 == 0, y)),
+        "reducing": lambda numbers: functools.reduce(lambda x, y: x * y, numbers),
+    }
+    backend = {"square": square, "filtering": filtering, "reducing": reducing}
+    if np is None:
+        print("NumPy is not installed: the NumPy column is skipped, and with it square() and\n"
+              "filtering(), which have no other backend to compare")
+    print(f"{'function':<10} {'size':>10} {'lambdas':>12} {'array.array':>12} {'NumPy':>12}"
+          "   (seconds per call)")
+    for name in lambdas:
+        if name != "reducing" and np is None:
+            continue
+        for size in (1_000, 10_000, 100_000, 1_000_000):
+            if name == "reducing":
+                data = array.array("d", [1.000001] * size)  # a product that stays a float
+            else:
+                data = array.array("q", range(size))
+            runs = [(lambdas[name], data)]
+            runs.append((backend[name], data) if name == "reducing" else None)
+            runs.append((backend[name], np.frombuffer(data, dtype=data.typecode))
+                        if np is not None else None)
+            repeats = max(1, 100_000 // size)
+            expected = None
+            cells = []
+            for run in runs:
+                if run is None:
+                    cells.append("-")
+                    continue
+                func, values = run
+                start = time.perf_counter()
+                for _ in range(repeats):
+                    result = func(values)
+                cells.append(f"{(time.perf_counter() - start) / repeats:.5f}")
+                result = result if name == "reducing" else list(result)
+                if expected is None:
+                    expected = result
+                elif name == "reducing":
+                    assert math.isclose(result, expected)
+                else:
+                    assert result == expected
+            print(f"{name:<10} {size:>10,} " + " ".join(f"{cell:>12}" for cell in cells))
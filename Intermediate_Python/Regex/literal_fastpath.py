@@ -0,0 +1,308 @@
+import re
+import timeit
+
+import pattern_cache
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+"""
+Skip the regex engine for patterns that are really just literal text.
+
+Many patterns in code.py are plain or anchored literals: "Tekwani$", "^Ch",
+"(and)", "\\$", "C{1}". For those, str.find/str.count/str.startswith/
+str.endswith (and the bytes versions) do the same job with much less work,
+"Tekwani$" in particular becomes a single endswith() instead of a scan of
+the whole string.
+
+analyze() parses a pattern and returns a LiteralPlan when the pattern can be
+answered with string methods, or None. FastPattern wraps a compiled pattern,
+uses the plan when there is one and falls back to the regex otherwise, so it
+can be used anywhere a compiled pattern is. Match objects are still real
+re.Match objects: the literal is located with find() and the regex is only
+asked to confirm the match at that exact position.
+"""
+
+class LiteralPlan:
+    """
+    What a literal pattern reduces to: the text itself, and whether it is tied
+    to the start ("^", "\\A") or the end ("$", "\\Z") of the string.
+    """
+
+    def __init__(self, literal, at_start=False, at_end=False, end_before_newline=False,
+                 group_texts=()):
+        self.literal = literal
+        self.at_start = at_start
+        self.at_end = at_end
+        self.end_before_newline = end_before_newline  # "$" also matches before a final "\n"
+        self.group_texts = group_texts  # what each group captures, always the same
+
+    def __repr__(self):
+        return (f"LiteralPlan({self.literal!r}, at_start={self.at_start}, "
+                f"at_end={self.at_end})")
+
+
+_START_ANCHORS = (sre_parse.AT_BEGINNING, sre_parse.AT_BEGINNING_STRING)
+_END_ANCHORS = (sre_parse.AT_END, sre_parse.AT_END_STRING)
+
+
+def _literal_codes(items, spans):
+    """
+    Return the character codes the parsed items always match, or None.
+
+    Args:
+        items: Parsed pattern items
+        spans: Dictionary filled with group number -> (start, end) in the codes
+    """
+    codes = []
+    for op, arg in items:
+        if op is sre_parse.LITERAL:
+            codes.append(arg)
+        elif op is sre_parse.SUBPATTERN:
+            group, add_flags, del_flags, pattern = arg
+            if add_flags & re.IGNORECASE:
+                return None
+            inner_spans = {}
+            inner = _literal_codes(pattern, inner_spans)
+            if inner is None:
+                return None
+            if group is not None:
+                inner_spans[group] = (0, len(inner))
+            for number, (start, end) in inner_spans.items():
+                spans[number] = (start + len(codes), end + len(codes))
+            codes.extend(inner)
+        elif op is sre_parse.MAX_REPEAT or op is sre_parse.MIN_REPEAT:
+            low, high, pattern = arg
+            inner_spans = {}
+            inner = _literal_codes(pattern, inner_spans)
+            if low != high or inner is None:
+                return None  # "C{1}" is a literal, "C{1,3}" is not
+            if low == 0:
+                if inner_spans:
+                    return None  # the groups would not take part in the match
+                continue
+            # A repeated group captures its last repetition
+            shift = len(codes) + (low - 1) * len(inner)
+            for number, (start, end) in inner_spans.items():
+                spans[number] = (start + shift, end + shift)
+            codes.extend(inner * low)
+        else:
+            return None
+    return codes
+
+
+def analyze(pattern, flags=0):
+    """
+    Return a LiteralPlan if pattern only matches one fixed string, else None.
+
+    Args:
+        pattern: Regex source (str or bytes)
+        flags: re flags the pattern is compiled with
+    """
+    if flags & (re.IGNORECASE | re.LOCALE):
+        return None
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except re.error:
+        return None
+    items = list(parsed)
+    parsed_flags = parsed.state.flags
+    if parsed_flags & re.IGNORECASE:
+        return None  # inline "(?i)"
+
+    at_start = at_end = end_before_newline = False
+    if items and items[0][0] is sre_parse.AT and items[0][1] in _START_ANCHORS:
+        if items[0][1] is sre_parse.AT_BEGINNING and parsed_flags & re.MULTILINE:
+            return None  # "^" would match after every newline
+        at_start = True
+        items = items[1:]
+    if items and items[-1][0] is sre_parse.AT and items[-1][1] in _END_ANCHORS:
+        if items[-1][1] is sre_parse.AT_END:
+            if parsed_flags & re.MULTILINE:
+                return None
+            end_before_newline = True
+        at_end = True
+        items = items[:-1]
+
+    spans = {}
+    codes = _literal_codes(items, spans)
+    if not codes:
+        return None  # not a literal, or an empty one that matches everywhere
+    if isinstance(pattern, bytes):
+        literal = bytes(codes)
+    else:
+        literal = "".join(map(chr, codes))
+    group_texts = tuple(literal[start:end] for _, (start, end) in sorted(spans.items()))
+    return LiteralPlan(literal, at_start, at_end, end_before_newline, group_texts)
+
+
+class FastPattern:
+    """A compiled pattern that answers literal patterns with string methods."""
+
+    def __init__(self, pattern, flags=0):
+        """
+        Compile pattern and work out whether it is a literal.
+
+        Args:
+            pattern: Regex source (str or bytes) or a compiled pattern
+            flags: re flags, used when pattern is not compiled yet
+        """
+        if isinstance(pattern, re.Pattern):
+            self.regex = pattern
+        else:
+            self.regex = pattern_cache.compile(pattern, flags)
+        self.pattern = self.regex.pattern
+        self.flags = self.regex.flags
+        self.groups = self.regex.groups
+        self.plan = analyze(self.pattern, self.regex.flags)
+
+    def _positions(self, string, pos=0, endpos=None):
+        """Yield the start of every non-overlapping literal match."""
+        plan = self.plan
+        literal = plan.literal
+        end = len(string) if endpos is None else min(endpos, len(string))
+        if plan.at_end:
+            newline = b"\n" if isinstance(string, bytes) else "\n"
+            start = end - len(literal)
+            if string.endswith(literal, pos, end):
+                found = start
+            elif (plan.end_before_newline and string[end - 1:end] == newline
+                  and string.endswith(literal, pos, end - 1)):
+                found = start - 1
+            else:
+                return
+            if not plan.at_start or (found == 0 and pos == 0):
+                yield found
+            return
+        if plan.at_start:
+            if pos == 0 and string.startswith(literal, 0, end):
+                yield 0
+            return
+        index = string.find(literal, pos, end)
+        while index != -1:
+            yield index
+            index = string.find(literal, index + len(literal), end)
+
+    def search(self, string, pos=0, endpos=None):
+        plan = self.plan
+        if plan is None:
+            return self._regex_call("search", string, pos, endpos)
+        if plan.at_start or plan.at_end:
+            for index in self._positions(string, pos, endpos):
+                return self._match_at(string, index, endpos)
+            return None
+        index = string.find(plan.literal, pos, len(string) if endpos is None else endpos)
+        if index == -1:
+            return None
+        return self._match_at(string, index, endpos)
+
+    def match(self, string, pos=0, endpos=None):
+        if self.plan is None:
+            return self._regex_call("match", string, pos, endpos)
+        plan = self.plan
+        if plan.at_end:
+            for index in self._positions(string, pos, endpos):
+                return self._match_at(string, index, endpos) if index == pos else None
+            return None
+        end = len(string) if endpos is None else endpos
+        if plan.at_start and pos != 0 or not string.startswith(plan.literal, pos, end):
+            return None
+        return self._match_at(string, pos, endpos)
+
+    def finditer(self, string, pos=0, endpos=None):
+        if self.plan is None:
+            return self._regex_call("finditer", string, pos, endpos)
+        return (self._match_at(string, index, endpos)
+                for index in self._positions(string, pos, endpos))
+
+    def findall(self, string, pos=0, endpos=None):
+        if self.plan is None:
+            return self._regex_call("findall", string, pos, endpos)
+        # Every match is the same text, so only the number of matches is needed
+        if self.groups == 0:
+            result = self.plan.literal
+        elif self.groups == 1:
+            result = self.plan.group_texts[0]
+        else:
+            result = self.plan.group_texts
+        return [result] * self.count(string, pos, endpos)
+
+    def count(self, string, pos=0, endpos=None):
+        """Number of non-overlapping matches."""
+        if self.plan is None:
+            return sum(1 for _ in self._regex_call("finditer", string, pos, endpos))
+        if self.plan.at_start or self.plan.at_end:
+            return sum(1 for _ in self._positions(string, pos, endpos))
+        end = len(string) if endpos is None else endpos
+        return string.count(self.plan.literal, pos, end)
+
+    def _match_at(self, string, index, endpos):
+        """Build the real re.Match object for a literal found at index."""
+        if endpos is None:
+            return self.regex.match(string, index)
+        return self.regex.match(string, index, endpos)
+
+    def _regex_call(self, method, string, pos, endpos):
+        if endpos is None:
+            return getattr(self.regex, method)(string, pos)
+        return getattr(self.regex, method)(string, pos, endpos)
+
+    def __repr__(self):
+        kind = "literal" if self.plan else "regex"
+        return f"FastPattern({self.pattern!r}, {kind})"
+
+
+def compile(pattern, flags=0):
+    """Like re.compile, but literal patterns skip the regex engine."""
+    return FastPattern(pattern, flags)
+
+
+def benchmark(lines=200_000, repeat=5):
+    """
+    Compare re with FastPattern on a literal-heavy workload.
+
+    Args:
+        lines: Number of log lines in the generated text
+        repeat: Runs per measurement, the fastest run is kept
+
+    The fast path wins on long strings. On many short strings the Python
+    level method call costs more than the regex engine itself, so per-line
+    filtering is shown as well to make that overhead visible.
+    """
+    info = "2024-01-01 INFO user=chandra paid $10 at Tekwani stores"
+    error = "2024-01-01 ERROR user=prakash payment failed"
+    lines_list = [error if i % 100 == 0 else info for i in range(lines)]
+    text = "\n".join(lines_list)
+    workloads = [
+        ("findall 'Tekwani'", "Tekwani", lambda p: p.findall(text)),
+        ("findall '\\$'", r"\$", lambda p: p.findall(text)),
+        ("findall '(and)'", "(and)", lambda p: p.findall(text)),
+        ("search 'stores$'", "stores$", lambda p: p.search(text)),
+        ("search 'WARNING' (absent)", "WARNING", lambda p: p.search(text)),
+        ("search 'ERROR' per line", "ERROR", lambda p: [p.search(l) for l in lines_list]),
+    ]
+
+    def spans(result):
+        if isinstance(result, list):
+            return [spans(m) for m in result]
+        return result.span() if isinstance(result, re.Match) else result
+
+    print(f"{'workload':<28} {'re ms':>9} {'fast ms':>9} {'speedup':>8}")
+    for name, source, work in workloads:
+        regex = re.compile(source)
+        fast = FastPattern(source)
+        assert spans(work(regex)) == spans(work(fast))
+        slow_time = min(timeit.repeat(lambda: work(regex), number=1, repeat=repeat))
+        fast_time = min(timeit.repeat(lambda: work(fast), number=1, repeat=repeat))
+        print(f"{name:<28} {slow_time * 1000:>9.2f} {fast_time * 1000:>9.2f} "
+              f"{slow_time / fast_time:>7.1f}x")
+
+if __name__ == "__main__":
+    text = "Chandra Prakash Tekwani"
+    for source in ["Tekwani$", "^Ch", "(and)", "\\$", "C{1}", "(ra){1,}", "[CP]h", "chandra"]:
+        fast = FastPattern(source)
+        print(fast, fast.plan, fast.findall(text))
+
+    benchmark()
@@ -0,0 +1,160 @@
+import mmap
+import os
+import re
+from collections import namedtuple
+
+import pattern_cache
+
+"""
+Search files with bytes patterns directly on a memory-mapped buffer.
+
+re works on anything that supports the buffer protocol, and an mmap object
+does. So instead of reading a multi-gigabyte log into a Python string, the
+file is mapped into memory and the operating system pages it in as the regex
+engine walks over it. Match spans are plain file offsets.
+
+Only bytes patterns can run on a buffer. Flags work as in code.py where they
+make sense for bytes: IGNORECASE, MULTILINE, DOTALL and VERBOSE. \\w, \\d, \\s
+and IGNORECASE only know about ASCII characters, and re.UNICODE is rejected.
+"""
+
+# A match copied out of the mapped file, safe to keep after the file is closed
+Span = namedtuple("Span", ["start", "end", "text"])
+
+
+def _compile(pattern, flags):
+    """Compile pattern as a bytes pattern, encoding str patterns as UTF-8."""
+    if isinstance(pattern, re.Pattern):
+        if not isinstance(pattern.pattern, bytes):
+            raise TypeError("memory-mapped files need a bytes pattern")
+        return pattern
+    if flags & re.UNICODE:
+        raise ValueError("re.UNICODE does not apply to bytes patterns")
+    if isinstance(pattern, str):
+        pattern = pattern.encode("utf-8")
+    return pattern_cache.compile(pattern, flags)
+
+
+class MappedFile:
+    """A read-only memory-mapped file that can be searched with bytes patterns."""
+
+    def __init__(self, path):
+        """
+        Map the file into memory.
+
+        Args:
+            path: Path of the file to search
+        """
+        self.path = path
+        self._file = open(path, "rb")
+        self.size = os.fstat(self._file.fileno()).st_size
+        self._map = None
+        if self.size:  # an empty file cannot be mapped
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            if hasattr(self._map, "madvise"):
+                self._map.madvise(mmap.MADV_SEQUENTIAL)  # regex scans front to back
+
+    @property
+    def buffer(self):
+        """The mapped bytes (an empty bytes object for an empty file)."""
+        return self._map if self._map is not None else b""
+
+    def finditer(self, pattern, flags=0, start=0, end=None):
+        """
+        Yield re.Match objects over the mapped file; they are only usable while
+        the file is open.
+
+        Args:
+            pattern: Bytes (or UTF-8 encodable str) pattern, or a compiled bytes pattern
+            flags: re flags, used when pattern is not compiled yet
+            start: File offset where the search starts
+            end: File offset where the search stops, the end of file by default
+        """
+        compiled = _compile(pattern, flags)
+        end = self.size if end is None else end
+        return compiled.finditer(self.buffer, start, end)
+
+    def search(self, pattern, flags=0, start=0, end=None):
+        """Return the first match as a Span, or None."""
+        end = self.size if end is None else end
+        m = _compile(pattern, flags).search(self.buffer, start, end)
+        return Span(m.start(), m.end(), m.group()) if m else None
+
+    def spans(self, pattern, flags=0, start=0, end=None):
+        """Yield every match as a Span with file offsets."""
+        for m in self.finditer(pattern, flags, start, end):
+            yield Span(m.start(), m.end(), m.group())
+
+    def findall(self, pattern, flags=0):
+        """Return the matched bytes, like re.findall without groups."""
+        return [m.group() for m in self.finditer(pattern, flags)]
+
+    def count(self, pattern, flags=0):
+        """Count the matches without copying any of them."""
+        return sum(1 for _ in self.finditer(pattern, flags))
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def mmap_finditer(pattern, path, flags=0):
+    """
+    Map path, yield every match as a Span with file offsets, and unmap it
+    when the generator is exhausted or closed.
+    """
+    with MappedFile(path) as mapped:
+        yield from mapped.spans(pattern, flags)
+
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+    import tracemalloc
+
+    with tempfile.NamedTemporaryFile("wb", suffix=".log", delete=False) as file:
+        file.write(b"Chandra\nPrakash\nTekwani\n")
+        for i in range(1_000_000):
+            file.write(b"2024-01-01 INFO user=chandra action=login id=%d\n" % i)
+        path = file.name
+
+    try:
+        with MappedFile(path) as mapped:
+            # The same flags as the demos in code.py, on bytes
+            print(mapped.search(b"chandra", re.IGNORECASE))
+            print(list(mapped.spans(b"^Pra\\w+$", re.MULTILINE, end=100)))
+            print(mapped.search(b"Prakash.Tekwani", re.DOTALL))
+            print(mapped.search(b"Tekwani #surname", re.VERBOSE))
+
+        size_mb = os.path.getsize(path) / 1_000_000
+        pattern = re.compile(rb"id=(\d*7)\n")
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        with open(path, "rb") as file:
+            count = sum(1 for _ in pattern.finditer(file.read()))
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"read():  {count} matches, {size_mb / elapsed:.1f} MB/s, "
+              f"peak memory {peak / 1_000_000:.1f} MB")
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        with MappedFile(path) as mapped:
+            count = mapped.count(pattern)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"mmap:    {count} matches, {size_mb / elapsed:.1f} MB/s, "
+              f"peak memory {peak / 1_000_000:.1f} MB")
+    finally:
+        os.remove(path)
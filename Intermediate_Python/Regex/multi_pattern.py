@@ -0,0 +1,369 @@
+import re
+import timeit
+from collections import namedtuple
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+import pattern_cache
+
+"""
+Run many regex patterns over a text in a single pass.
+
+code.py runs every pattern ("[CP]h", "(ra)", "\\bChandra\\b", ...) with its own
+findall, so N patterns means N full scans of the same text. MultiPattern
+merges a named set of patterns into one alternation that finds, in a single
+pass, every position where at least one of them matches.
+
+A plain alternation of hundreds of patterns is slow, because the engine
+tries every alternative at every position. So the patterns are grouped by the
+characters they can start with, and every group is guarded by a lookahead:
+
+    (?=[C])(?:(?:[CP]h)|(?:\\bChandra\\b))|(?=[P])(?:(?:[CP]h))|(?=[r])(?:(?:(ra)))|...
+
+At a given position only the patterns that can start with that character
+are tried. Patterns whose first character cannot be worked out (e.g. "a*",
+"\\w+", IGNORECASE patterns) are added to every group.
+
+At each position the combined pattern stops at, every pattern that can
+start with that character is matched on its own, unless its previous match
+still covers the position. Each pattern therefore gets exactly the matches
+its own finditer would give, even where they overlap matches of other
+patterns. Patterns that cannot be merged safely (back references, LOCALE
+flag) or that can match the empty string (they match at every position, so
+merging them gains nothing) are scanned on their own and their matches are
+merged into the result by position.
+"""
+
+# A single match reported by MultiPattern; groups are the pattern's own groups
+Hit = namedtuple("Hit", ["name", "start", "end", "text", "groups"])
+
+# Global inline flags such as "(?i)" must be at the start of a pattern, so they
+# are removed from the source and turned into a scoped group "(?i:...)" instead
+_GLOBAL_FLAGS = re.compile(r"^\(\?([aiLmsux]+)\)")
+_BACKREFERENCE = re.compile(r"\\[1-9]|\(\?P=|\(\?\(")
+_SCOPED_FLAGS = [(re.IGNORECASE, "i"), (re.MULTILINE, "m"), (re.DOTALL, "s"),
+                 (re.VERBOSE, "x"), (re.ASCII, "a")]
+_MAX_FIRST_CHARS = 256  # wider character classes are treated as "any character"
+
+
+def first_chars(items):
+    """
+    Return the set of characters a parsed pattern can start with, or None
+    when it cannot be worked out (the pattern may start with anything or
+    match the empty string).
+
+    Args:
+        items: Parsed pattern as returned by sre_parse.parse()
+    """
+    for op, arg in items:
+        if op is sre_parse.AT:
+            continue  # anchors and \b take no characters, look at the next item
+        if op is sre_parse.LITERAL:
+            return {chr(arg)}
+        if op is sre_parse.IN:
+            chars = set()
+            for kind, value in arg:
+                if kind is sre_parse.LITERAL:
+                    chars.add(chr(value))
+                elif kind is sre_parse.RANGE and value[1] - value[0] < _MAX_FIRST_CHARS:
+                    chars.update(chr(c) for c in range(value[0], value[1] + 1))
+                else:
+                    return None  # negated sets and categories such as \w
+            return chars
+        if op is sre_parse.SUBPATTERN:
+            group, add_flags, del_flags, pattern = arg
+            if add_flags & re.IGNORECASE or pattern.getwidth()[0] == 0:
+                return None
+            return first_chars(pattern)
+        if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            low, high, pattern = arg
+            if low == 0:
+                return None
+            return first_chars(pattern)
+        if op is sre_parse.BRANCH:
+            chars = set()
+            for branch in arg[1]:
+                branch_chars = first_chars(branch)
+                if branch_chars is None:
+                    return None
+                chars |= branch_chars
+            return chars
+        return None
+    return None
+
+
+def drop_group_names(source):
+    """
+    Turn every named group "(?P<name>...)" of a pattern source into a plain
+    capturing group "(...)", leaving escapes and character classes alone.
+    Patterns merged into one alternation may then use the same group names.
+
+    Args:
+        source: Regex source as a str
+    """
+    parts = []
+    i = 0
+    in_class = False
+    while i < len(source):
+        char = source[i]
+        if char == "\\":
+            parts.append(source[i:i + 2])
+            i += 2
+            continue
+        if in_class:
+            in_class = char != "]"
+        elif char == "[":
+            in_class = True
+            # A "]" right after "[" or "[^" is a literal, not the end of the class
+            end = i + 1 + (source[i + 1:i + 2] == "^")
+            if source[end:end + 1] == "]":
+                parts.append(source[i:end + 1])
+                i = end + 1
+                continue
+        elif source.startswith("(?P<", i):
+            close = source.index(">", i)
+            parts.append("(")
+            i = close + 1
+            continue
+        parts.append(char)
+        i += 1
+    return "".join(parts)
+
+
+class MultiPattern:
+    """A named set of patterns matched together in one pass over the text."""
+
+    def __init__(self, patterns, flags=0):
+        """
+        Build the combined pattern.
+
+        Args:
+            patterns: Dictionary name -> pattern, where pattern is a regex
+                source or a (source, flags) tuple
+            flags: Flags applied to every pattern given without its own flags
+        """
+        if not patterns:
+            raise ValueError("at least one pattern is required")
+        self.names = list(patterns)
+        self.standalone = {}  # name -> compiled pattern scanned on its own
+        self._parts = []  # (name, compiled) of the merged patterns
+        self._candidates = {}  # first character -> indexes in _parts of the patterns to try
+        self._any_start = ()  # indexes of the patterns to try at every other character
+
+        parts = []
+        kind = None
+        for name, spec in patterns.items():
+            source, pattern_flags = spec if isinstance(spec, tuple) else (spec, flags)
+            if kind is None:
+                kind = type(source)
+            elif type(source) is not kind:
+                raise TypeError("cannot mix str and bytes patterns")
+
+            compiled = pattern_cache.compile(source, pattern_flags)
+            if self._needs_standalone(compiled):
+                self.standalone[name] = compiled
+                continue
+            parts.append((name, compiled))
+
+        self._combined = None
+        if parts:
+            self._parts = parts
+            self._combined = self._build(parts, kind)
+
+    @staticmethod
+    def _needs_standalone(compiled):
+        """Tell whether a pattern has to be scanned separately."""
+        source = compiled.pattern
+        if isinstance(source, bytes):
+            source = source.decode("latin-1")
+        if compiled.flags & re.LOCALE or _BACKREFERENCE.search(source):
+            return True
+        return sre_parse.parse(compiled.pattern, compiled.flags).getwidth()[0] == 0
+
+    @staticmethod
+    def _scoped_source(compiled, kind):
+        """Return the pattern source with its flags moved into a scoped group."""
+        source = compiled.pattern
+        if kind is bytes:
+            source = source.decode("latin-1")
+        while _GLOBAL_FLAGS.match(source):
+            source = _GLOBAL_FLAGS.sub("", source, count=1)
+        # The combined pattern only finds positions, the names are not needed
+        # there, and two patterns using the same name would not compile
+        source = drop_group_names(source)
+        scoped = "".join(letter for flag, letter in _SCOPED_FLAGS
+                         if compiled.flags & flag)
+        if kind is bytes:
+            scoped = scoped.replace("a", "")  # bytes patterns are ASCII anyway
+        if not scoped:
+            return source
+        if "x" in scoped:
+            # The newline ends a trailing VERBOSE comment before the ")"
+            return f"(?{scoped}:{source}\n)"
+        return f"(?{scoped}:{source})"
+
+    def _build(self, parts, kind):
+        """Group the patterns by their first characters and join them."""
+        sources = []
+        starts = []
+        for name, compiled in parts:
+            sources.append(self._scoped_source(compiled, kind))
+            chars = None
+            if not compiled.flags & re.IGNORECASE:
+                chars = first_chars(sre_parse.parse(compiled.pattern, compiled.flags))
+            starts.append(chars)
+
+        # For every character, the patterns (in their listed order) worth trying
+        any_start = [i for i, chars in enumerate(starts) if chars is None]
+        by_char = {}
+        for i, chars in enumerate(starts):
+            for char in chars or ():
+                by_char.setdefault(char, []).append(i)
+        # Characters that lead to the same patterns share one lookahead
+        buckets = {}
+        for char, indexes in by_char.items():
+            key = tuple(sorted(indexes + any_start))
+            buckets.setdefault(key, []).append(char)
+            # Indexing bytes gives ints, so bytes texts look characters up by code
+            self._candidates[ord(char) if kind is bytes else char] = key
+        self._any_start = tuple(any_start)
+
+        alternatives = []
+        for indexes, chars in sorted(buckets.items(), key=lambda item: item[0][0]):
+            members = "|".join(f"(?:{sources[i]})" for i in indexes)
+            guard = "".join(sorted(re.escape(char) for char in chars))
+            alternatives.append(f"(?=[{guard}])(?:{members})")
+        if any_start:
+            # Positions starting with any other character only need these
+            members = "|".join(f"(?:{sources[i]})" for i in any_start)
+            if by_char:
+                guard = "".join(sorted(re.escape(char) for char in by_char))
+                alternatives.append(f"(?![{guard}])(?:{members})")
+            else:
+                alternatives.append(f"(?:{members})")
+
+        combined = "|".join(alternatives)
+        if kind is bytes:
+            combined = combined.encode("latin-1")
+        return pattern_cache.compile(combined)
+
+    def finditer(self, text):
+        """Yield a Hit for every match, in order of position."""
+        if not self.standalone:
+            yield from self._combined_hits(text)
+            return
+        streams = [self._combined_hits(text)] if self._combined else []
+        for name, compiled in self.standalone.items():
+            streams.append(self._standalone_hits(name, compiled, text))
+        order = {name: i for i, name in enumerate(self.names)}
+        yield from sorted((hit for stream in streams for hit in stream),
+                          key=lambda hit: (hit.start, order[hit.name]))
+
+    @staticmethod
+    def _standalone_hits(name, compiled, text):
+        for m in compiled.finditer(text):
+            yield Hit(name, m.start(), m.end(), m.group(), m.groups())
+
+    def _combined_hits(self, text):
+        search = self._combined.search
+        parts = self._parts
+        candidates = self._candidates
+        any_start = self._any_start
+        next_start = [0] * len(parts)  # where each pattern's own finditer would continue
+        pos = 0
+        while True:
+            found = search(text, pos)
+            if found is None:
+                return
+            pos = found.start()
+            # Merged patterns never match the empty string, so pos < len(text)
+            for i in candidates.get(text[pos], any_start):
+                if next_start[i] <= pos:
+                    m = parts[i][1].match(text, pos)
+                    if m is not None:
+                        next_start[i] = m.end()
+                        yield Hit(parts[i][0], pos, m.end(), m.group(), m.groups())
+            pos += 1
+
+    def scan(self, text):
+        """
+        Return a dictionary name -> list of matched strings: for every
+        pattern the same as [m.group() for m in pattern.finditer(text)], but
+        the text is searched in one pass.
+        """
+        results = {name: [] for name in self.names}
+        for hit in self.finditer(text):
+            results[hit.name].append(hit.text)
+        return results
+
+
+def scan_one_by_one(patterns, text):
+    """The current approach: one full findall per pattern, used as a baseline."""
+    results = {}
+    for name, source in patterns.items():
+        results[name] = [m.group() for m in pattern_cache.compile(source).finditer(text)]
+    return results
+
+
+def benchmark(pattern_counts=(10, 50, 100, 200, 500), text_size=200_000, repeat=3):
+    """
+    Compare one combined scan with one-pattern-at-a-time for growing pattern sets.
+
+    Args:
+        pattern_counts: Number of patterns to try
+        text_size: Length of the generated text in characters
+        repeat: Runs per measurement, the fastest run is kept
+    """
+    words = ["Chandra", "Prakash", "Tekwani", "log", "error", "warning", "info"]
+    text = " ".join(f"{words[i % len(words)]}{i % 997}" for i in range(text_size // 10))
+    text = text[:text_size]
+    size_mb = len(text) / 1_000_000
+
+    print(f"{'patterns':>8} {'one by one MB/s':>16} {'combined MB/s':>14} {'speedup':>8}")
+    for count in pattern_counts:
+        patterns = {}
+        for i in range(count):
+            word = words[i % len(words)]
+            if i % 3 == 0:
+                patterns[f"p{i}"] = rf"\b{word}{i}\b"  # literal word
+            elif i % 3 == 1:
+                patterns[f"p{i}"] = rf"{word}{i}[0-9]"  # literal followed by a class
+            else:
+                patterns[f"p{i}"] = rf"[A-Z]\w+{i}\b"  # needs the regex engine
+        multi = MultiPattern(patterns)
+
+        assert multi.scan(text) == scan_one_by_one(patterns, text)
+        separate = min(timeit.repeat(lambda: scan_one_by_one(patterns, text),
+                                     number=1, repeat=repeat))
+        combined = min(timeit.repeat(lambda: multi.scan(text), number=1, repeat=repeat))
+        print(f"{count:>8} {size_mb / separate:>16.2f} {size_mb / combined:>14.2f} "
+              f"{separate / combined:>7.1f}x")
+
+
+if __name__ == "__main__":
+    text = "Chandra Prakash Tekwani"
+    multi = MultiPattern({
+        "ch_or_ph": "[CP]h",
+        "ra": "(ra)",
+        "word": r"\bChandra\b",
+        "ignorecase": ("chandra", re.IGNORECASE),
+        "verbose": ("Tekwani #surname", re.X),
+        "repeated": r"(a)k\1",  # back reference, scanned on its own
+    })
+    for hit in multi.finditer(text):
+        print(hit.name, hit.start, hit.end, hit.text)
+    print(multi.scan(text))
+
+    # Log patterns often share group names; each keeps its own groups
+    log = "12:00:01 ERROR disk full\n12:00:02 WARN disk 91%\n"
+    levels = MultiPattern({
+        "error": r"(?P<ts>\d\d:\d\d:\d\d) ERROR (?P<msg>.*)",
+        "warning": r"(?P<ts>\d\d:\d\d:\d\d) WARN (?P<msg>.*)",
+    })
+    for hit in levels.finditer(log):
+        print(hit.name, hit.groups)
+
+    benchmark()
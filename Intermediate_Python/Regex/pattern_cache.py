@@ -0,0 +1,144 @@
+import re
+import threading
+from collections import OrderedDict
+
+"""
+A small registry of compiled regex patterns.
+
+re.compile() keeps its own internal cache, but it is small and shared by the
+whole program, so a job that cycles through more patterns than it holds ends
+up recompiling the same expressions again and again. PatternCache compiles
+each (pattern, flags) pair once, keeps the compiled objects in a size-bounded
+LRU (least recently used) cache and counts hits, misses and evictions, so we
+can see when the working set of patterns is bigger than the cache.
+"""
+
+class PatternCache:
+    """LRU cache of compiled regex patterns keyed by (pattern, flags)."""
+
+    def __init__(self, maxsize=256):
+        """
+        Initialize the cache.
+
+        Args:
+            maxsize: Maximum number of compiled patterns kept at once
+        """
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self._patterns = OrderedDict()  # (pattern, flags) -> compiled pattern
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def compile(self, pattern, flags=0):
+        """
+        Return the compiled pattern, compiling it only on a cache miss.
+
+        Args:
+            pattern: Regex source (str or bytes)
+            flags: re flags, e.g. re.IGNORECASE | re.MULTILINE
+        """
+        key = (type(pattern), pattern, int(flags))
+        with self._lock:
+            compiled = self._patterns.get(key)
+            if compiled is not None:
+                self.hits += 1
+                self._patterns.move_to_end(key)  # mark as most recently used
+                return compiled
+            self.misses += 1
+
+        # Compile outside the lock so a slow pattern does not block other threads
+        compiled = re.compile(pattern, flags)
+
+        with self._lock:
+            self._patterns[key] = compiled
+            self._patterns.move_to_end(key)
+            while len(self._patterns) > self.maxsize:
+                self._patterns.popitem(last=False)  # drop the least recently used
+                self.evictions += 1
+        return compiled
+
+    # Shortcuts mirroring the module level functions of re
+    def match(self, pattern, string, flags=0):
+        return self.compile(pattern, flags).match(string)
+
+    def search(self, pattern, string, flags=0):
+        return self.compile(pattern, flags).search(string)
+
+    def findall(self, pattern, string, flags=0):
+        return self.compile(pattern, flags).findall(string)
+
+    def finditer(self, pattern, string, flags=0):
+        return self.compile(pattern, flags).finditer(string)
+
+    def stats(self):
+        """Return a dictionary with the current counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._patterns),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+    def is_thrashing(self, min_lookups=1000, max_hit_ratio=0.5):
+        """
+        Tell whether the cache is too small for the patterns in use.
+
+        Args:
+            min_lookups: Lookups needed before the verdict means anything
+            max_hit_ratio: Hit ratio below which evictions count as thrashing
+        """
+        stats = self.stats()
+        lookups = stats["hits"] + stats["misses"]
+        return (lookups >= min_lookups and stats["evictions"] > 0
+                and stats["hit_ratio"] < max_hit_ratio)
+
+    def clear(self):
+        """Drop every cached pattern and reset the counters."""
+        with self._lock:
+            self._patterns.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self._patterns)
+
+    def __contains__(self, pattern):
+        if isinstance(pattern, tuple):
+            pattern, flags = pattern
+        else:
+            flags = 0
+        return (type(pattern), pattern, int(flags)) in self._patterns
+
+
+# Shared default registry, so separate modules reuse each other's patterns
+default_cache = PatternCache()
+
+def compile(pattern, flags=0):
+    """Compile through the shared default registry."""
+    return default_cache.compile(pattern, flags)
+
+
+if __name__ == "__main__":
+    text = "Chandra Prakash Tekwani"
+    cache = PatternCache(maxsize=4)
+
+    # The same pattern is compiled only once, no matter how often it is used
+    for line in [text] * 3:
+        print(cache.findall("[^CP]a", line))
+        print(cache.search("Tekwani$", line).group())
+        print(cache.findall("chandra", line, re.IGNORECASE))
+    print(cache.stats())
+
+    # Cycling through more patterns than the cache can hold makes it thrash
+    patterns = ["C", "h", "a", "n", "d", "r"]
+    for _ in range(200):
+        for p in patterns:
+            cache.findall(p, text)
+    print(cache.stats())
+    print("Thrashing:", cache.is_thrashing())
@@ -0,0 +1,255 @@
+import math
+import multiprocessing
+import re
+import time
+from collections import namedtuple
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+"""
+Benchmark how regex patterns scale with input size, and catch the ones that
+backtrack catastrophically before they meet production traffic.
+
+Every registered pattern is run against generated inputs of growing size
+(16, 32, 64, ... characters). For each size the best of a few findall() runs
+is kept, and the scaling exponent is the slope of log(time) against
+log(size): about 1 for a pattern that is linear in its input, 2 for a
+quadratic one, and much more for exponential backtracking such as
+"((ra)+)+$" on "rararara...!".
+
+Two kinds of input are generated for every pattern:
+    natural: "Chandra Prakash Tekwani " repeated, like the text in code.py
+    adversarial: the pattern's own literal characters repeated, followed by
+        a character that makes the match fail at the very end, which is
+        what triggers the backtracking
+
+Each measurement runs in a worker process with a timeout, because a
+catastrophic pattern cannot be interrupted once the regex engine is running.
+A timeout counts as super-linear. Patterns are also checked statically for
+nested unbounded quantifiers, the usual cause of the problem.
+"""
+
+# Measured time for one input size
+Sample = namedtuple("Sample", ["size", "seconds"])
+
+# Benchmark result for one pattern and one kind of input
+Result = namedtuple("Result", ["name", "pattern", "input", "samples", "exponent",
+                               "seconds_per_mb", "timed_out", "nested_quantifiers",
+                               "super_linear"])
+
+NATURAL_TEXT = "Chandra Prakash Tekwani "
+
+
+def natural_input(pattern, size):
+    """The text from code.py repeated up to size characters."""
+    text = NATURAL_TEXT * (size // len(NATURAL_TEXT) + 1)
+    return text[:size]
+
+
+def adversarial_input(pattern, size):
+    """The pattern's literal characters repeated, then a failing character."""
+    alphabet = _literal_alphabet(pattern) or "Chandra"
+    text = alphabet * (size // len(alphabet) + 1)
+    return text[:max(size - 1, 0)] + "!"
+
+
+def _literal_alphabet(pattern):
+    """Literal characters of the pattern, in order, without duplicates."""
+    seen = []
+    stack = [sre_parse.parse(pattern.pattern, pattern.flags)]
+    while stack:
+        for op, arg in stack.pop():
+            if op is sre_parse.LITERAL and chr(arg) not in seen and chr(arg) != "!":
+                seen.append(chr(arg))
+            elif op is sre_parse.SUBPATTERN:
+                stack.append(arg[3])
+            elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+                stack.append(arg[2])
+            elif op is sre_parse.BRANCH:
+                stack.extend(arg[1])
+    return "".join(seen)
+
+
+def nested_quantifiers(pattern):
+    """
+    Return True if an unbounded quantifier contains another quantifier that
+    can repeat, e.g. "(a+)+", "(\\w+\\s?)*", "((ra){1,}){1,}".
+    """
+    def walk(items, inside_unbounded):
+        for op, arg in items:
+            if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+                low, high, sub = arg
+                repeats = high == sre_parse.MAXREPEAT or high > 1
+                if inside_unbounded and repeats:
+                    return True
+                if walk(sub, inside_unbounded or high == sre_parse.MAXREPEAT):
+                    return True
+            elif op is sre_parse.SUBPATTERN:
+                if walk(arg[3], inside_unbounded):
+                    return True
+            elif op is sre_parse.BRANCH:
+                if any(walk(branch, inside_unbounded) for branch in arg[1]):
+                    return True
+            elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+                if walk(arg[1], inside_unbounded):
+                    return True
+        return False
+
+    return walk(sre_parse.parse(pattern.pattern, pattern.flags), False)
+
+
+def _timed_findall(pattern, generator, size, repeat):
+    """Runs in the worker process: build the input and time findall on it."""
+    text = generator(pattern, size)
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pattern.findall(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def scaling_exponent(samples, min_seconds=1e-4):
+    """
+    Slope of log(seconds) against log(size), by least squares.
+
+    Args:
+        samples: Measured Samples
+        min_seconds: Faster samples are mostly timer noise and are left out
+    """
+    points = [(math.log(s.size), math.log(s.seconds)) for s in samples if s.seconds >= min_seconds]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    spread = sum((x - mean_x) ** 2 for x, _ in points)
+    if spread == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / spread
+
+
+class RegexBenchmark:
+    """A registry of patterns and the harness that measures their scaling."""
+
+    INPUTS = {"natural": natural_input, "adversarial": adversarial_input}
+
+    def __init__(self, min_size=16, max_size=1 << 18, factor=2, repeat=3, timeout=2.0,
+                 max_exponent=1.5):
+        """
+        Configure the harness.
+
+        Args:
+            min_size: Smallest generated input, in characters
+            max_size: Largest generated input, in characters
+            factor: Growth factor between two input sizes
+            repeat: findall() runs per size, the fastest one is kept
+            timeout: Seconds a single run may take before the pattern is flagged
+            max_exponent: Scaling exponent above which a pattern is flagged
+        """
+        self.min_size = min_size
+        self.max_size = max_size
+        self.factor = factor
+        self.repeat = repeat
+        self.timeout = timeout
+        self.max_exponent = max_exponent
+        self.patterns = {}  # name -> (compiled pattern, input generators)
+
+    def register(self, name, pattern, flags=0, inputs=None):
+        """
+        Add a pattern to the benchmark.
+
+        Args:
+            name: Name used in the report
+            pattern: Regex source or compiled pattern
+            flags: re flags, used when pattern is not compiled yet
+            inputs: Dictionary name -> generator(pattern, size), the built-in
+                natural and adversarial inputs by default; generators must be
+                module level functions so they can be sent to a worker process
+        """
+        compiled = pattern if isinstance(pattern, re.Pattern) else re.compile(pattern, flags)
+        self.patterns[name] = (compiled, inputs or self.INPUTS)
+
+    def sizes(self):
+        size = self.min_size
+        while size <= self.max_size:
+            yield int(size)
+            size *= self.factor
+
+    def measure(self, name, pattern, input_name, generator):
+        """Time one pattern on one kind of input for every size."""
+        samples = []
+        timed_out = False
+        pool = multiprocessing.Pool(1)
+        try:
+            for size in self.sizes():
+                job = pool.apply_async(_timed_findall, (pattern, generator, size, self.repeat))
+                try:
+                    seconds = job.get(self.timeout * self.repeat)
+                except multiprocessing.TimeoutError:
+                    timed_out = True
+                    break
+                samples.append(Sample(size, seconds))
+                if seconds > self.timeout:
+                    timed_out = True
+                    break
+        finally:
+            pool.terminate()  # also kills a worker stuck in the regex engine
+
+        exponent = scaling_exponent(samples)
+        largest = samples[-1] if samples else None
+        seconds_per_mb = largest.seconds / (largest.size / 1_000_000) if largest else None
+        nested = nested_quantifiers(pattern)
+        super_linear = timed_out or (exponent is not None and exponent > self.max_exponent)
+        return Result(name, pattern.pattern, input_name, samples, exponent, seconds_per_mb,
+                      timed_out, nested, super_linear)
+
+    def run(self):
+        """Measure every registered pattern on each of its inputs."""
+        results = []
+        for name, (pattern, inputs) in self.patterns.items():
+            for input_name, generator in inputs.items():
+                results.append(self.measure(name, pattern, input_name, generator))
+        return results
+
+    @staticmethod
+    def report(results):
+        """Format the results as a table, flagged patterns first."""
+        lines = [f"{'pattern':<24} {'input':<12} {'max size':>9} {'ms/MB':>10} "
+                 f"{'exponent':>9}  verdict"]
+        for r in sorted(results, key=lambda r: (not r.super_linear, r.name)):
+            size = r.samples[-1].size if r.samples else 0
+            per_mb = f"{r.seconds_per_mb * 1000:.1f}" if r.seconds_per_mb is not None else "-"
+            exponent = f"{r.exponent:.2f}" if r.exponent is not None else "-"
+            verdict = []
+            if r.timed_out:
+                verdict.append("TIMEOUT")
+            if r.super_linear:
+                verdict.append("SUPER-LINEAR")
+            if r.nested_quantifiers:
+                verdict.append("nested quantifiers")
+            lines.append(f"{r.name:<24} {r.input:<12} {size:>9} {per_mb:>10} {exponent:>9}  "
+                         f"{', '.join(verdict) or 'ok'}")
+        return "\n".join(lines)
+
+
+def default_benchmark(**options):
+    """A benchmark with the patterns from code.py and a few known bad variants."""
+    bench = RegexBenchmark(**options)
+    for source in [".h", "^Ch", "Tekwani$", "a*", "a+", "[CP]h", "[^CP]a", "(and)", "C|P",
+                   r"\$", "(ra)", "(ra){1,}", "(ra){1,3}", r"\d", r"\w", r"\W", r"\s",
+                   r"\bChandra\b"]:
+        bench.register(source, source)
+    bench.register("chandra (IGNORECASE)", "chandra", re.IGNORECASE)
+    # Variants of "(ra){1,}" that backtrack catastrophically on a near miss
+    bench.register("((ra){1,}){1,}$", "((ra){1,}){1,}$")
+    bench.register("(ra|rara)+$", "(ra|rara)+$")
+    bench.register(r"(\w+\s?)+$", r"(\w+\s?)+$")
+    return bench
+
+
+if __name__ == "__main__":
+    bench = default_benchmark(max_size=1 << 16, timeout=1.0)
+    print(bench.report(bench.run()))
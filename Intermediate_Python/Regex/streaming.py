@@ -0,0 +1,182 @@
+import io
+import os
+import re
+
+import pattern_cache
+
+"""
+Run a regex over a file or stream that is too big to load into memory.
+
+The data is read in fixed-size chunks. Each chunk is glued to the tail of the
+previous one, so a match that crosses a chunk boundary is still found, and a
+match is only reported once enough data has been read after it to be sure
+that more input could not change it. Memory use stays around
+chunk_size + max_match no matter how big the input is.
+
+Two numbers bound what "enough data" means:
+    max_match: the longest match the pattern can produce. Longer matches
+        that cross a chunk boundary may be cut short or missed.
+    lookaround: characters a pattern may look at outside of its match
+        (lookbehind/lookahead, \\b, ^ and $ with MULTILINE). At least this
+        much text is kept before the search position, so "^" with MULTILINE
+        still sees the newline that ended the previous chunk and a plain "^"
+        or "\\A" only ever matches at the real start of the input.
+"""
+
+
+class StreamMatch:
+    """A match found by stream_finditer, with offsets relative to the whole input."""
+
+    def __init__(self, match, offset):
+        self.match = match  # the re.Match object on the internal buffer
+        self.offset = offset  # absolute position of the buffer start
+        self.re = match.re
+
+    def start(self, group=0):
+        start = self.match.start(group)
+        return start if start == -1 else start + self.offset
+
+    def end(self, group=0):
+        end = self.match.end(group)
+        return end if end == -1 else end + self.offset
+
+    def span(self, group=0):
+        return self.start(group), self.end(group)
+
+    def group(self, *groups):
+        return self.match.group(*groups)
+
+    def groups(self, default=None):
+        return self.match.groups(default)
+
+    def groupdict(self, default=None):
+        return self.match.groupdict(default)
+
+    def __getitem__(self, group):
+        return self.match[group]
+
+    def __repr__(self):
+        return f"<StreamMatch span={self.span()!r}, match={self.group()!r}>"
+
+
+def _open(source, binary, encoding):
+    """Return (file object, should_close) for a path or an already open file."""
+    if isinstance(source, (str, bytes, os.PathLike)):
+        if binary:
+            return open(source, "rb"), True
+        return open(source, "r", encoding=encoding, newline=""), True
+    return source, False
+
+
+def stream_finditer(pattern, source, flags=0, chunk_size=1 << 20, max_match=4096,
+                    lookaround=64, encoding="utf-8"):
+    """
+    Lazily yield every match of pattern in source, like re.finditer.
+
+    Args:
+        pattern: Regex source or compiled pattern; bytes patterns read the
+            input in binary mode, str patterns in text mode
+        source: Path of a file, or a file object opened in the matching mode
+        flags: re flags, used when pattern is not compiled yet
+        chunk_size: Characters (or bytes) read at a time
+        max_match: Longest match the pattern is expected to produce
+        lookaround: Context kept around the search position, see above
+        encoding: Encoding used when a text file is opened from a path
+
+    Offsets are character offsets for text input and byte offsets for binary input.
+    """
+    if isinstance(pattern, (str, bytes)):
+        pattern = pattern_cache.compile(pattern, flags)
+    lookaround = max(lookaround, 1)
+    overlap = max_match + lookaround
+    if chunk_size <= overlap:
+        raise ValueError("chunk_size must be larger than max_match + lookaround")
+
+    binary = isinstance(pattern.pattern, bytes)
+    stream, should_close = _open(source, binary, encoding)
+    try:
+        buffer = stream.read(0)  # empty str or bytes, whichever the stream gives
+        if isinstance(buffer, bytes) != binary:
+            raise TypeError("the pattern and the stream must both be str or both be bytes")
+
+        offset = 0  # absolute position of buffer[0]
+        pos = 0  # where the next search starts inside buffer
+        skip_empty_at = -1  # absolute position of an empty match already reported
+        eof = False
+        while not eof:
+            chunk = stream.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+            # Matches starting after this point may still grow with more data
+            safe_limit = len(buffer) if eof else len(buffer) - overlap
+
+            resume = pos
+            for m in pattern.finditer(buffer, pos):
+                if m.start() > safe_limit:
+                    break
+                if m.start() == m.end() == skip_empty_at - offset:
+                    continue
+                yield StreamMatch(m, offset)
+                resume = m.end()
+                skip_empty_at = offset + m.end() if m.start() == m.end() else -1
+            else:
+                if eof:
+                    return
+            # No match can start between the last match and safe_limit
+            resume = max(resume, safe_limit + 1)
+
+            # Keep the unsearched tail plus some context before it
+            keep_from = max(resume - lookaround, 0)
+            buffer = buffer[keep_from:]
+            offset += keep_from
+            pos = resume - keep_from
+    finally:
+        if should_close:
+            stream.close()
+
+
+def stream_findall(pattern, source, flags=0, **options):
+    """Return the matched strings, like re.findall without groups."""
+    return [m.group() for m in stream_finditer(pattern, source, flags, **options)]
+
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+    import tracemalloc
+
+    # Matches crossing chunk boundaries are found with their absolute offsets
+    text = "Chandra\nPrakash\nTekwani\n" * 5
+    for m in stream_finditer(re.compile("^Pra\\w+$", re.MULTILINE), io.StringIO(text),
+                             chunk_size=12, max_match=8, lookaround=2):
+        print(m, text[m.start():m.end()])
+    assert stream_findall("(?m)^T\\w+", io.StringIO(text), chunk_size=12,
+                          max_match=8, lookaround=2) == re.findall("(?m)^T\\w+", text)
+
+    # Memory stays flat while scanning a file much bigger than the chunk size
+    with tempfile.NamedTemporaryFile("wb", suffix=".log", delete=False) as file:
+        line = b"2024-01-01 INFO user=chandra action=login\n"
+        for _ in range(500_000):
+            file.write(line)
+        path = file.name
+    try:
+        start = time.perf_counter()
+        count = sum(1 for _ in stream_finditer(rb"user=(\w+)", path, chunk_size=1 << 16))
+        elapsed = time.perf_counter() - start
+
+        size_mb = os.path.getsize(path) / 1_000_000
+        print(f"{count} matches in {size_mb:.1f} MB, {size_mb / elapsed:.1f} MB/s")
+
+        # Flat memory means the peak does not grow with the input: compare
+        # the whole file with its first tenth (already in memory, not traced)
+        with open(path, "rb") as file:
+            tenth = io.BytesIO(file.read(os.path.getsize(path) // 10))
+        for label, source in [("first tenth", tenth), ("whole file", path)]:
+            tracemalloc.start()
+            for _ in stream_finditer(rb"user=(\w+)", source, chunk_size=1 << 16):
+                pass
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"  peak memory scanning the {label}: {peak / 1024:.0f} KiB")
+    finally:
+        os.remove(path)